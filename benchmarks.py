@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Flask-Compressor benchmark suite
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Measure the build pipeline, the template helper and the blueprint routes
+    with synthetic bundles. Results are saved as JSON, and can be compared
+    with the results of a previous run:
+
+        python benchmarks.py --output new.json --compare old.json
+
+    With --minifiers, the built-in minifiers are compared with `cssmin` and
+    `jsmin` (when installed).
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import flask
+from flask_compressor import Compressor, Asset, CSSBundle
+from flask_compressor.minify import minify_css, minify_js
+
+try:
+    from cssmin import cssmin
+except ImportError:
+    cssmin = None
+
+try:
+    from jsmin import jsmin
+except ImportError:
+    jsmin = None
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+#: synthetic bundles: name -> (number of assets, size of each asset in bytes)
+SCENARIOS = {
+    'small': (5, 1024),
+    'medium': (50, 10 * 1024),
+    'large': (200, 10 * 1024),
+}
+
+CSS_RULE = '''
+.selector-{0} > a:hover {{
+    color: #{0:06x};
+    margin: 0 {0}px;
+}}
+'''
+
+
+JS_FUNCTION = '''
+/**
+ * Handler {0}.
+ */
+function handler{0}(event, options) {{
+    // merge the options
+    var settings = extend({{}}, defaults, options || {{}});
+    if (!event.target.matches('.item-{0}')) {{
+        return false;
+    }}
+    var value = event.target.value.replace(/\\s+/g, ' ');
+    for (var i = 0; i < settings.count; i++) {{
+        total += i * 2 / settings.ratio;
+    }}
+    return "item " + value + ' ' + total;
+}}
+'''
+
+
+def collapse_whitespace(content):
+    """ A processor doing some work on each character, like a minifier. """
+    return re.sub(r'\s+', ' ', content)
+
+
+def make_css(index, size):
+    """ Return about `size` bytes of CSS rules. """
+    rules = []
+    length = 0
+    while length < size:
+        rule = CSS_RULE.format(index * 1000 + len(rules))
+        rules.append(rule)
+        length += len(rule)
+    return ''.join(rules)
+
+
+def make_js(size):
+    """ Return about `size` bytes of JavaScript code. """
+    functions = []
+    length = 0
+    while length < size:
+        function = JS_FUNCTION.format(len(functions))
+        functions.append(function)
+        length += len(function)
+    return ''.join(functions)
+
+
+def create_app(scenario):
+    """ Return a Flask application with a bundle for `scenario`. """
+    count, size = SCENARIOS[scenario]
+
+    app = flask.Flask(__name__)
+    compressor = Compressor(app)
+    compressor.register_processor(collapse_whitespace)
+    compressor.register_bundle(CSSBundle(
+        name='bundle',
+        assets=[Asset(make_css(index, size),
+                      processors=['collapse_whitespace'])
+                for index in range(count)],
+        processors=['collapse_whitespace'],
+    ))
+    return app
+
+
+def measure(func, repeat):
+    """ Call `func` `repeat` times and return timings in seconds. """
+    timings = []
+    for _ in range(repeat):
+        start = timer()
+        func()
+        timings.append(timer() - start)
+    return timings
+
+
+def run_scenario(scenario, repeat):
+    """ Run all benchmarks for `scenario`, return a dict with timings for
+    each benchmark. """
+    results = {}
+
+    def cold(func):
+        # a new application for each call, so nothing is cached
+        def run():
+            app = create_app(scenario)
+            with app.test_request_context():
+                bundle = app.extensions['compressor'].get_bundle('bundle')
+                start = timer()
+                func(app, bundle)
+                return timer() - start
+        return [run() for _ in range(repeat)]
+
+    def warm(func):
+        app = create_app(scenario)
+        with app.test_request_context():
+            bundle = app.extensions['compressor'].get_bundle('bundle')
+            func(app, bundle)
+            return measure(lambda: func(app, bundle), repeat)
+
+    def get_content(app, bundle):
+        bundle.get_content()
+
+    def get_hash(app, bundle):
+        return bundle.hash
+
+    def template_helper(app, bundle):
+        app.jinja_env.globals['compressor']('bundle', inline=False)
+
+    def render_bundle(app, bundle):
+        app.test_client().get(bundle.url)
+
+    def render_asset(app, bundle):
+        app.test_client().get(bundle.assets[0].url)
+
+    for name, func in [('get_content', get_content), ('hash', get_hash),
+                       ('template_helper', template_helper),
+                       ('render_bundle', render_bundle),
+                       ('render_asset', render_asset)]:
+        results['{}.cold'.format(name)] = cold(func)
+        results['{}.warm'.format(name)] = warm(func)
+
+    return results
+
+
+def run_minifiers(size, repeat):
+    """ Run the minifiers on about `size` bytes of CSS and of JavaScript,
+    return a dict with timings for each minifier. """
+    css = make_css(0, size)
+    js = make_js(size)
+    minifiers = [
+        ('css.builtin_cssmin', minify_css, css),
+        ('css.cssmin', cssmin, css),
+        ('js.builtin_jsmin', minify_js, js),
+        ('js.jsmin', jsmin, js),
+    ]
+
+    results = {}
+    for name, func, content in minifiers:
+        if func is not None:
+            results[name] = measure(lambda: func(content), repeat)
+    return results
+
+
+def summarize(timings):
+    """ Return a dict with statistics about `timings`. """
+    return {
+        'min': min(timings),
+        'mean': sum(timings) / len(timings),
+        'max': max(timings),
+        'repeat': len(timings),
+    }
+
+
+def compare(results, baseline, threshold):
+    """ Print a comparison of `results` with `baseline`, and return the
+    names of the benchmarks slower than `threshold` (a ratio). """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        ratio = results[name]['min'] / max(baseline[name]['min'], 1e-9)
+        flag = ''
+        if ratio > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('{:<40} {:>8.2f}x{}'.format(name, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--scenario', action='append',
+                        choices=sorted(SCENARIOS),
+                        help='scenario to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of runs for each benchmark')
+    parser.add_argument('--output', help='save results in this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compare with results from this JSON file')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='slowdown ratio reported as a regression')
+    parser.add_argument('--minifiers', action='store_true',
+                        help='also benchmark the minifiers')
+    parser.add_argument('--minify-size', type=int, default=50,
+                        help='size of the minified contents, in KB')
+    args = parser.parse_args(argv)
+
+    timings = {}
+    for scenario in args.scenario or sorted(SCENARIOS):
+        for name, values in run_scenario(scenario, args.repeat).items():
+            timings['{}.{}'.format(scenario, name)] = values
+    if args.minifiers:
+        minifiers = run_minifiers(args.minify_size * 1024, args.repeat)
+        for name, values in minifiers.items():
+            timings['minify.{}'.format(name)] = values
+
+    results = {}
+    for key in sorted(timings):
+        results[key] = summarize(timings[key])
+        print('{:<40} {:>10.3f} ms'.format(key, results[key]['min'] * 1000))
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump({
+                'python': platform.python_version(),
+                'flask': flask.__version__,
+                'results': results,
+            }, handle, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)['results']
+        print()
+        if compare(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
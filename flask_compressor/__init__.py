@@ -12,44 +12,152 @@
 from __future__ import unicode_literals, absolute_import, division, \
     print_function
 import os
+import json
+import inspect
 import functools
-import hashlib
-from flask import current_app, url_for
+import weakref
+import zlib
+from flask import current_app, url_for, has_app_context
 from .exceptions import CompressorException
-from .blueprint import blueprint as compressor_blueprint
+from .cache import NullCache, FileSystemCache, LRUCache, SingleFlight, \
+    make_cache_key
+from .manifest import Manifest, build as build_manifest
+from .encoding import encode, get_available_encodings
+from .executor import SerialExecutor, PoolExecutor
+from .lessc import LesscWorkerPool
+from .fingerprint import fingerprint, get_hash_factory
+from .metrics import Metrics, timer
+from .signals import processor_called
+from .warmup import WarmUp
+from .preload import send_early_hints, add_preload_headers, \
+    EARLY_HINTS_ENVIRON_KEY
+from .common import extract_common_assets
+from .blueprint import blueprint as compressor_blueprint, SENDFILE_HEADERS
 from .templating import compressor as compressor_template_helper
 from .processors import DEFAULT_PROCESSORS
 
+try:
+    from .cli import compressor_cli
+except ImportError:
+    # the command line interface requires Flask >= 0.11
+    compressor_cli = None
+
+
+# marker for values not found in a cache
+_missing = object()
+
+
+def is_coroutine_function(func):
+    """ Return `True` if `func` is a coroutine function (`async def`), always
+    `False` on Python 2. """
+    iscoroutinefunction = getattr(inspect, 'iscoroutinefunction', None)
+    return iscoroutinefunction is not None and iscoroutinefunction(func)
+
+
+def is_chunk_boundary(data, chunk_size):
+    """ Return `True` if a chunk of a bundle split by size must end after an
+    asset whose processed content is `data` (bytes).
+
+    The decision only depends on the asset itself (a checksum of its content
+    compared to its size), so modifying an asset never moves the boundaries
+    after the next asset ending a chunk. A chunk ends after an asset with a
+    probability of `2 * len(data) / chunk_size`: chunks are about half of
+    `chunk_size` on average.
+    """
+    checksum = zlib.crc32(data) & 0xffffffff
+    return checksum * chunk_size < 2 * len(data) * 0x100000000
+
 
 class memoized(object):
-    """ Decorator. Caches a function or method return value only if the current
-    Flask application is *not* in debug mode. """
+    """ Decorator. Caches a function or method return value.
+
+    Return values are stored in the :class:`flask_compressor.cache.LRUCache`
+    of the :class:`Compressor` extension (`Compressor.memory_cache`). For
+    instance methods, the instance is only weakly referenced: cached values
+    are removed when the instance is garbage collected.
+
+    Concurrent calls with the same arguments are evaluated only once: the
+    first caller evaluates the return value, the other callers wait for it
+    (see :class:`flask_compressor.cache.SingleFlight`). Exceptions are never
+    cached.
+
+    If the Flask application is in debug mode, methods of bundles and assets
+    are cached until a source file is modified (see
+    `get_source_signature()`), other return values are never cached. """
 
     def __init__(self, func):
         """ Initialize the decorator with a function (or method) """
         self.func = func
-        self.cache = {}
 
-    def __call__(self, *args, **kwargs):
-        """ Call the decorated function (or method) if the Flask application is
-        not in debug mode, or the return value is not yet cached. """
+    def make_key(self, args, kwargs):
+        """ Return a `(key, owner)` tuple: the key used to store the return
+        value in the cache, and the bundle or the asset owning the value (or
+        `None`). The key is `None` if the return value must not be cached.
+        """
+        # the instance is weakly referenced so it can be garbage collected
+        owner = None
+        if args and isinstance(args[0], (Bundle, Asset)):
+            owner = args[0]
+            key = (self, weakref.ref(owner), args[1:],
+                   frozenset(kwargs.items()))
+        else:
+            key = (self, args, frozenset(kwargs.items()))
+
         if current_app.debug:
-            # always reevaluate the return value when debug is enabled
-            return self.func(*args, **kwargs)
+            if owner is None:
+                # always reevaluate the return value
+                return None, None
 
-        # compute the key to store the retur value in a dict
-        key = (args, frozenset(kwargs.items()))
+            # reevaluate the return value when a source file is modified
+            key += (owner.get_source_signature(),)
+
+        return key, owner
+
+    def get_cached(self, *args, **kwargs):
+        """ Return the cached return value for these arguments, or a marker
+        object if there is no cached value. Used by
+        :mod:`flask_compressor.aio` to share values with synchronous calls.
+        """
+        key, _ = self.make_key(args, kwargs)
+        if key is None:
+            return _missing
+        cache = current_app.extensions['compressor'].memory_cache
+        return cache.get(key, _missing)
+
+    def set_cached(self, value, *args, **kwargs):
+        """ Store `value` as the return value for these arguments. """
+        key, owner = self.make_key(args, kwargs)
+        if key is not None:
+            cache = current_app.extensions['compressor'].memory_cache
+            cache.set(key, value, owner=owner)
 
-        if key in self.cache:
+    def __call__(self, *args, **kwargs):
+        """ Call the decorated function (or method) if the return value is not
+        yet cached. """
+        compressor = current_app.extensions['compressor']
+        cache = compressor.memory_cache
+
+        key, owner = self.make_key(args, kwargs)
+        if key is None:
+            return self.func(*args, **kwargs)
+
+        value = cache.get(key, _missing)
+        if value is not _missing:
             # the return value is already evaluated, return it
-            return self.cache[key]
+            return value
 
-        # evaluate the return value (call the decorated function)
-        value = self.func(*args, **kwargs)
+        def evaluate():
+            # the return value may have been stored by another thread since
+            # the cache was checked
+            value = cache.get(key, _missing, count=False)
+            if value is _missing:
+                # evaluate the return value (call the decorated function)
+                value = self.func(*args, **kwargs)
+                cache.set(key, value, owner=owner)
+            return value
 
-        # store and return the return value
-        self.cache[key] = value
-        return value
+        # concurrent calls wait for the first one
+        return compressor.single_flight.do(key, evaluate)
 
     def __repr__(self):
         """ Return a representation of the decorated function (or method) """
@@ -57,6 +165,9 @@ class memoized(object):
 
     def __get__(self, obj, objtype):
         """ Support instance method """
+        if obj is None:
+            # accessed from the class
+            return self
         return functools.partial(self.__call__, obj)
 
 
@@ -73,6 +184,24 @@ class Compressor(object):
         """
         self._bundles = {}
         self._processors = {}
+        # output of the `compressor()` template helper, indexed by
+        # `(bundle_name, inline)`, when debug is disabled
+        self.markup_cache = {}
+        self.cache = NullCache()
+        self.memory_cache = LRUCache()
+        self.processor_cache = None
+        self.single_flight = SingleFlight()
+        self.executor = SerialExecutor()
+        self.lessc_pool = None
+        self.metrics = None
+        self.manifest = None
+        self.warm_up = None
+        # `Link` headers sent with `103 Early Hints` responses, indexed by
+        # endpoint
+        self.early_hints = {}
+        # names of the common bundles linked before a bundle, indexed by the
+        # name of the bundle
+        self.common_bundles = {}
 
         self.app = app
         if app is not None:
@@ -89,15 +218,110 @@ class Compressor(object):
         Args:
             app: your Flask application
         """
+        app.config.setdefault('COMPRESSOR_MEMORY_CACHE_MAX_ENTRIES', None)
+        app.config.setdefault('COMPRESSOR_MEMORY_CACHE_MAX_SIZE', None)
+        app.config.setdefault('COMPRESSOR_PROCESSOR_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('COMPRESSOR_CACHE_DIR', None)
+        app.config.setdefault('COMPRESSOR_CACHE_MAX_SIZE', 100 * 1024 * 1024)
+        app.config.setdefault('COMPRESSOR_MANIFEST', None)
+        app.config.setdefault('COMPRESSOR_EXECUTOR', None)
+        app.config.setdefault('COMPRESSOR_MAX_WORKERS', None)
+        app.config.setdefault('COMPRESSOR_LESSC_POOL_SIZE', 0)
+        app.config.setdefault('COMPRESSOR_LESSC_WORKER_COMMAND', None)
+        app.config.setdefault('COMPRESSOR_LESSC_TIMEOUT', 30)
+        app.config.setdefault('COMPRESSOR_LESSC_HEALTH_CHECK_INTERVAL', None)
+        app.config.setdefault('COMPRESSOR_ENCODINGS', ['br', 'gzip'])
+        app.config.setdefault('COMPRESSOR_STREAM_CHUNK_SIZE', 64 * 1024)
+        app.config.setdefault('COMPRESSOR_HASH_ALGORITHM', 'md5')
+        app.config.setdefault('COMPRESSOR_HASH_LENGTH', None)
+        app.config.setdefault('COMPRESSOR_STATS', False)
+        app.config.setdefault('COMPRESSOR_OUTPUT_DIR', None)
+        app.config.setdefault('COMPRESSOR_SENDFILE', None)
+        app.config.setdefault('COMPRESSOR_X_ACCEL_REDIRECT_PREFIX',
+                              '/_compressor_files')
+        app.config.setdefault('COMPRESSOR_PRELOAD_HEADERS', True)
+        app.config.setdefault('COMPRESSOR_EARLY_HINTS', False)
+        app.config.setdefault('COMPRESSOR_EARLY_HINTS_ENVIRON_KEY',
+                              EARLY_HINTS_ENVIRON_KEY)
+
+        # fail early if the hash algorithm is not available
+        get_hash_factory(app.config['COMPRESSOR_HASH_ALGORITHM'])
+        if app.config['COMPRESSOR_SENDFILE'] not in SENDFILE_HEADERS:
+            raise CompressorException(
+                "Unknown sendfile mode '{}', use 'x-sendfile' or "
+                "'x-accel-redirect'.".format(app.config['COMPRESSOR_SENDFILE'])
+            )
+        app.config.setdefault('COMPRESSOR_CACHE_CONTROL',
+                              'public, max-age=31536000, immutable')
+        app.config.setdefault('COMPRESSOR_DEBUG_CACHE_CONTROL', 'no-cache')
+
+        # in-memory cache for memoized methods
+        self.memory_cache = LRUCache(
+            max_entries=app.config['COMPRESSOR_MEMORY_CACHE_MAX_ENTRIES'],
+            max_size=app.config['COMPRESSOR_MEMORY_CACHE_MAX_SIZE'],
+        )
+
+        # in-memory cache for results of processors, indexed by their input
+        if app.config['COMPRESSOR_PROCESSOR_CACHE_MAX_ENTRIES']:
+            self.processor_cache = LRUCache(
+                max_entries=app.config[
+                    'COMPRESSOR_PROCESSOR_CACHE_MAX_ENTRIES'
+                ],
+                max_size=app.config['COMPRESSOR_MEMORY_CACHE_MAX_SIZE'],
+            )
+
+        # persistent cache for processed contents
+        if app.config['COMPRESSOR_CACHE_DIR'] is not None:
+            self.cache = FileSystemCache(
+                app.config['COMPRESSOR_CACHE_DIR'],
+                max_size=app.config['COMPRESSOR_CACHE_MAX_SIZE'],
+            )
+
+        # process assets in parallel
+        if app.config['COMPRESSOR_EXECUTOR'] is not None:
+            self.executor = PoolExecutor(
+                kind=app.config['COMPRESSOR_EXECUTOR'],
+                max_workers=app.config['COMPRESSOR_MAX_WORKERS'],
+            )
+
+        # compile LESS contents with long-lived workers
+        if app.config['COMPRESSOR_LESSC_POOL_SIZE']:
+            self.lessc_pool = LesscWorkerPool(
+                command=app.config['COMPRESSOR_LESSC_WORKER_COMMAND'],
+                size=app.config['COMPRESSOR_LESSC_POOL_SIZE'],
+                timeout=app.config['COMPRESSOR_LESSC_TIMEOUT'],
+                health_check_interval=app.config[
+                    'COMPRESSOR_LESSC_HEALTH_CHECK_INTERVAL'
+                ],
+            )
+
+        # collect metrics
+        if app.config['COMPRESSOR_STATS']:
+            self.metrics = Metrics()
+            self.metrics.connect(app)
+
+        # serve bundles built ahead of time
+        if app.config['COMPRESSOR_MANIFEST'] is not None:
+            self.manifest = Manifest.load(app.config['COMPRESSOR_MANIFEST'])
+
         # add `compressor\ functions in jinja templates
         app.jinja_env.globals['compressor'] = compressor_template_helper
 
+        # preload linked bundles
+        app.after_request(add_preload_headers)
+        if app.config['COMPRESSOR_EARLY_HINTS']:
+            app.before_request(send_early_hints)
+
         # register the Compressor extension in the Flask app
         app.extensions['compressor'] = self
 
         # register the blueprint
         app.register_blueprint(compressor_blueprint, url_prefix='/_compressor')
 
+        # add the `flask compressor` command
+        if compressor_cli is not None and hasattr(app, 'cli'):
+            app.cli.add_command(compressor_cli)
+
     def register_bundle(self, bundle, replace=False):
         """ Add a bundle in the list of available bundles.
 
@@ -118,6 +342,11 @@ class Compressor(object):
                                       "".format(bundle.name))
 
         self._bundles[bundle.name] = bundle
+        self.common_bundles.pop(bundle.name, None)
+
+        # forget the output of the template helper for the replaced bundle
+        for inline in (True, False):
+            self.markup_cache.pop((bundle.name, inline), None)
 
     def get_bundle(self, name):
         """ Get the bundle identified by its `name`.
@@ -136,6 +365,211 @@ class Compressor(object):
 
         return self._bundles[name]
 
+    def build(self, output_dir):
+        """ Process all registered bundles and write the results in
+        `output_dir`, with a manifest describing the build.
+
+        Set the `COMPRESSOR_MANIFEST` configuration value to the path of the
+        manifest to serve the built bundles without processing them again.
+        Contents are also compressed with each available encoding of the
+        `COMPRESSOR_ENCODINGS` configuration value.
+
+        Args:
+            output_dir: the directory where files are written
+
+        Returns:
+            A :class:`flask_compressor.manifest.Manifest` object.
+        """
+        # always process bundles from their sources
+        manifest, self.manifest = self.manifest, None
+        try:
+            with current_app.test_request_context():
+                return build_manifest(
+                    self._bundles.values(),
+                    output_dir,
+                    encodings=get_available_encodings(
+                        current_app.config['COMPRESSOR_ENCODINGS']
+                    ),
+                )
+        finally:
+            self.manifest = manifest
+
+    def extract_common_bundles(self, min_bundles=2, prefix='common'):
+        """ Move the assets shared by at least `min_bundles` registered
+        bundles into common bundles, so they are downloaded and cached only
+        once by browsers.
+
+        Only the leading assets of the bundles are moved (assets with the
+        same source and the same processors), and only between bundles of
+        the same class with the same processors. The common bundles are
+        registered (named `common_js`, `common_css`, ...), and the
+        `compressor()` template helper links (or inlines) them before the
+        bundles, once per request.
+
+        Call this method once all bundles are registered, with the same
+        bundles when serving a build.
+
+        Args:
+            min_bundles: the minimum number of bundles sharing an asset
+                (default: `2`)
+            prefix: the prefix of the names of the common bundles (default:
+                `common`)
+
+        Returns:
+            a list with the common bundles
+
+        Raises:
+            CompressorException: If `min_bundles` is lower than 2.
+        """
+        if min_bundles < 2:
+            raise CompressorException("An asset must be shared by at least "
+                                      "2 bundles to be extracted.")
+
+        common_bundles, bundles, common_names = extract_common_assets(
+            list(self._bundles.values()), min_bundles=min_bundles,
+            prefix=prefix, reserved_names=list(self._bundles),
+        )
+
+        # bundles extracted again keep their previous common bundles, which
+        # come first
+        previous = self.common_bundles.copy()
+        for bundle in common_bundles + bundles:
+            self.register_bundle(bundle, replace=True)
+        for name, names in common_names.items():
+            self.common_bundles[name] = previous.get(name, []) + names
+        return common_bundles
+
+    def warm(self, app=None, background=False):
+        """ Process all registered bundles, so the first requests don't have
+        to wait for processors.
+
+        Call this method once all bundles are registered. The progress of the
+        warm-up is available as `Compressor.warm_up`, and at the
+        `/_compressor/ready` URL (useful for readiness probes).
+
+        Args:
+            app: the Flask application (default: the current application, or
+                the application given to the constructor)
+            background: If `True`, bundles are processed in a background
+                thread and this method returns immediately. (default:
+                `False`)
+
+        Returns:
+            A :class:`flask_compressor.warmup.WarmUp` object.
+        """
+        if app is None:
+            app = current_app._get_current_object() if has_app_context() \
+                else self.app
+
+        self.warm_up = WarmUp(app, self._bundles.values())
+        if background:
+            self.warm_up.start()
+        else:
+            self.warm_up.run()
+        return self.warm_up
+
+    def get_processor_cache_key(self, name, processor, content):
+        """ Return the key of the result of a processor in
+        `Compressor.processor_cache`, or `None` if the result must not be
+        cached.
+
+        The key is built from the name of the processor, its identity (so a
+        replaced processor never gets the results of the previous one), its
+        version (see :meth:`get_processor_version`), the debug flag and the
+        content to process. Processors with a `cacheable`
+        attribute set to `False` are never cached.
+        """
+        if self.processor_cache is None or \
+                not getattr(processor, 'cacheable', True):
+            return None
+        return make_cache_key('processor', name, id(processor),
+                              self.get_processor_version(processor),
+                              current_app.debug, content)
+
+    @staticmethod
+    def get_processor_version(processor):
+        """ Return the `version` attribute of `processor` (`None` if it has
+        no such attribute). If the attribute is callable, it's called to get
+        the version, so it can be computed lazily. """
+        version = getattr(processor, 'version', None)
+        if callable(version):
+            version = version()
+        return version
+
+    def get_processor_versions(self, names):
+        """ Return a list of `(name, version)` tuples for the processors
+        identified by `names`, used in the keys of the persistent cache so
+        cached contents are not used anymore when the version of a processor
+        changes (see :meth:`get_processor_version`). """
+        return [(name,
+                 self.get_processor_version(self._processors.get(name)))
+                for name in names]
+
+    def run_processor(self, name, content):
+        """ Call the processor identified by its `name` with `content`, using
+        the executor of the extension.
+
+        Results are cached in `Compressor.processor_cache`, so the same
+        content is processed only once by a processor, even if it's used by
+        several assets or bundles (see :meth:`get_processor_cache_key`).
+
+        The :data:`flask_compressor.signals.processor_called` signal is sent
+        with the duration of the call.
+
+        Args:
+            name: the name of the processor
+            content: the content to process
+
+        Returns:
+            the processed content
+        """
+        processor = self.get_processor(name)
+        key = self.get_processor_cache_key(name, processor, content)
+        if key is None:
+            return self._call_processor(name, processor, content)
+
+        value = self.processor_cache.get(key, _missing)
+        if value is not _missing:
+            return value
+
+        def evaluate():
+            # the result may have been stored by another thread
+            value = self.processor_cache.get(key, _missing, count=False)
+            if value is _missing:
+                value = self._call_processor(name, processor, content)
+                self.processor_cache.set(key, value)
+            return value
+
+        return self.single_flight.do(key, evaluate)
+
+    def _call_processor(self, name, processor, content):
+        """ Call `processor` with `content`, and send the
+        :data:`flask_compressor.signals.processor_called` signal. """
+        start = timer()
+        if is_coroutine_function(processor):
+            # only available on Python 3
+            from .aio import run_sync
+            content = run_sync(processor, content)
+        else:
+            content = self.executor.run_processor(processor, content)
+        processor_called.send(current_app._get_current_object(), name=name,
+                              duration=timer() - start)
+        return content
+
+    def get_stats(self):
+        """ Return the metrics collected by the extension (see
+        :meth:`flask_compressor.metrics.Metrics.get_stats`), or `None` if
+        `COMPRESSOR_STATS` is disabled. """
+        if self.metrics is None:
+            return None
+
+        caches = {'memory': self.memory_cache}
+        if self.processor_cache is not None:
+            caches['processor'] = self.processor_cache
+        if isinstance(self.cache, FileSystemCache):
+            caches['persistent'] = self.cache
+        return self.metrics.get_stats(caches)
+
     def register_default_processors(self):
         """ Register default processors.
 
@@ -152,7 +586,10 @@ class Compressor(object):
 
         A processor is a Python function that accepts one argument (usually
         the content of an :class:`Asset` object), and returns the processed
-        content.
+        content. Coroutine functions (`async def`) are also accepted: they
+        are awaited by the asynchronous pipeline (see
+        :meth:`Bundle.aget_content`), and run in an event loop by synchronous
+        calls.
 
         Args:
             processor: the function used to process contents
@@ -175,6 +612,10 @@ class Compressor(object):
                                       "replace an existing processor."
                                       "".format(name))
 
+        if name in self._processors and self.processor_cache is not None:
+            # forget the results of the replaced processor
+            self.processor_cache.clear()
+
         self._processors[name] = processor
 
     def get_processor(self, name):
@@ -211,10 +652,12 @@ class Bundle(object):
                               'type="{mimetype}">'
     default_mimetype = 'text/plain'
     default_extension = 'txt'
+    default_preload_as = None
 
     def __init__(self, name, assets=None, processors=None,
                  inline_template=None, linked_template=None, mimetype=None,
-                 extension=None):
+                 extension=None, incremental=False, preload_as=None,
+                 chunk_size=None):
         """ Initializes a :class:`Bundle` instance.
 
         Args:
@@ -236,6 +679,20 @@ class Bundle(object):
                 bundle (default: `text/plain`)
             extension: the file extension associated with the mimetype
                 (default: `txt`)
+            incremental: If `True`, processors of the bundle are applied to
+                each asset before the concatenation, so only modified assets
+                are processed again. Processors with a `whole_bundle`
+                attribute set to `True` (and the following processors) are
+                still applied to the concatenation. (default: `False`)
+            preload_as: the destination of the content in `Link: <url>;
+                rel=preload; as=...` headers (`style` or `script`), or `None`
+                to never preload the bundle (default: `None`)
+            chunk_size: If not `None`, the linked content of the bundle is
+                split into chunks of consecutive assets, each chunk being at
+                most `chunk_size` bytes (unless it contains a single bigger
+                asset). Each chunk has its own hash and URL, the boundaries
+                of the chunks depend on the content of the assets (see
+                :func:`is_chunk_boundary`). (default: `None`)
         """
         self.name = name
         self.assets = assets or []
@@ -244,26 +701,98 @@ class Bundle(object):
         self.linked_template = linked_template or self.default_linked_template
         self.mimetype = mimetype or self.default_mimetype
         self.extension = extension or self.default_extension
+        self.incremental = incremental
+        self.preload_as = preload_as or self.default_preload_as
+        self.chunk_size = chunk_size
+        # `BundleChunk` objects, kept while the chunk layout doesn't change
+        self._chunks = None
 
         for asset in self.assets:
             asset.bundle = self
 
-    def apply_processors(self, contents):
+    def apply_processors(self, contents, processors=None):
         """ Apply all processors to the provided data.
 
         Args:
             data: a list of strings
+            processors: the names of the processors to apply (default: the
+                processors of the bundle)
 
         Returns:
             A list of modified strings with all processors applied.
         """
+        if processors is None:
+            processors = self.processors
+
         compressor = current_app.extensions['compressor']
-        for name in self.processors:
-            processor = compressor.get_processor(name)
-            contents = [processor(content) for content in contents]
+        for name in processors:
+            contents = compressor.executor.map(
+                functools.partial(compressor.run_processor, name),
+                contents
+            )
 
         return contents
 
+    def split_processors(self):
+        """ Split the processors of the bundle in two lists: processors
+        applied to each asset, and processors applied to the concatenation of
+        all assets.
+
+        If the bundle is not `incremental`, all processors are applied to the
+        concatenation. Otherwise, processors are applied to each asset,
+        except the first processor with a `whole_bundle` attribute set to
+        `True` and all the following processors.
+
+        Returns:
+            a tuple with two lists of processor names
+        """
+        if not self.incremental:
+            return [], self.processors
+
+        compressor = current_app.extensions['compressor']
+        for index, name in enumerate(self.processors):
+            processor = compressor.get_processor(name)
+            if getattr(processor, 'whole_bundle', False):
+                return self.processors[:index], self.processors[index:]
+
+        return self.processors, []
+
+    def get_cache_key(self, *parts):
+        """ Return a key identifying a processed content of the bundle in
+        the persistent cache.
+
+        The key is built from the raw content and the processors (names and
+        versions) of each asset, and from the processors of the bundle.
+
+        Args:
+            parts: additional values identifying the processed content
+        """
+        compressor = current_app.extensions['compressor']
+        sources = [
+            (asset.raw_content,
+             compressor.get_processor_versions(asset.processors))
+            for asset in self.assets
+        ]
+        return make_cache_key('bundle', sources,
+                              compressor.get_processor_versions(
+                                  self.processors
+                              ),
+                              self.incremental, current_app.debug, *parts)
+
+    def get_source_signature(self):
+        """ Return a value which changes each time a source file of an asset
+        in the bundle is modified. Used in debug mode to invalidate memoized
+        values. """
+        return tuple(asset.get_source_signature() for asset in self.assets)
+
+    def get_manifest_entry(self):
+        """ Return the entry of the bundle in the manifest, or `None` if the
+        bundle was not built ahead of time. """
+        manifest = current_app.extensions['compressor'].manifest
+        if manifest is None:
+            return None
+        return manifest.get_bundle(self.name)
+
     @memoized
     def get_contents(self, apply_processors=True):
         """ Returns a list with the content of each assets.
@@ -276,16 +805,48 @@ class Bundle(object):
             a list of strings, each string corresponding to the content of an
             asset
         """
-        contents = []
+        cache = current_app.extensions['compressor'].cache
+        key = self.get_cache_key('contents', apply_processors)
+
+        def process():
+            # process assets (in parallel if an executor is configured), each
+            # asset caches its own processed content
+            processors = tuple(self.processors) if apply_processors else ()
+            executor = current_app.extensions['compressor'].executor
+            return json.dumps(executor.map(
+                lambda asset: asset.get_processed_content(processors),
+                self.assets
+            ))
+
+        return json.loads(cache.get_or_set(key, process))
+
+    def get_content_chunks(self, processors=()):
+        """ Return the content of each asset, altered by `processors`, with
+        newlines between them. The concatenation of the returned list is the
+        content of the bundle if all processors of the bundle are applied to
+        each asset.
 
-        for asset in self.assets:
-            contents.append(asset.content)
+        Args:
+            processors: a tuple with the names of the processors to apply to
+                each asset (default: `()`)
 
-        # apply processors
-        if apply_processors:
-            contents = self.apply_processors(contents)
+        Returns:
+            a list of strings
+        """
+        # process assets (in parallel if an executor is configured), each
+        # asset caches its own processed content
+        executor = current_app.extensions['compressor'].executor
+        contents = executor.map(
+            lambda asset: asset.get_processed_content(processors),
+            self.assets
+        )
 
-        return contents
+        chunks = []
+        for index, content in enumerate(contents):
+            if index:
+                chunks.append('\n')
+            chunks.append(content)
+        return chunks
 
     @memoized
     def get_content(self, apply_processors=True):
@@ -298,13 +859,71 @@ class Bundle(object):
         Returns:
             a string
         """
-        content = '\n'.join(self.get_contents(apply_processors=False))
+        entry = self.get_manifest_entry()
+        if entry is not None and apply_processors:
+            manifest = current_app.extensions['compressor'].manifest
+            return manifest.read(entry)
+
+        cache = current_app.extensions['compressor'].cache
+        key = self.get_cache_key('content', apply_processors)
+
+        def process():
+            if apply_processors:
+                asset_processors, bundle_processors = self.split_processors()
+            else:
+                asset_processors, bundle_processors = [], []
+
+            content = ''.join(
+                self.get_content_chunks(tuple(asset_processors))
+            )
 
-        # apply processors
-        if apply_processors:
-            content = self.apply_processors([content])[0]
+            # apply processors to the concatenation
+            if bundle_processors:
+                content = self.apply_processors([content],
+                                                bundle_processors)[0]
+            return content
 
-        return content
+        return cache.get_or_set(key, process)
+
+    def aget_content(self, apply_processors=True):
+        """ Asynchronous version of :meth:`get_content`, returns a coroutine:
+
+            content = await bundle.aget_content()
+
+        Assets are processed concurrently, coroutine processors are awaited
+        and other processors run in threads, so the event loop is never
+        blocked (see :mod:`flask_compressor.aio`). Requires Python 3.7 or
+        later.
+        """
+        from .aio import get_bundle_content
+        return get_bundle_content(self, apply_processors)
+
+    def encode_content(self, encoding):
+        """ Compress the processed content of the bundle with `encoding`.
+        The result is not memoized, see :meth:`get_encoded_content`.
+
+        Args:
+            encoding: the name of the encoding (`identity`, `gzip` or
+                `br`)
+
+        Returns:
+            bytes
+        """
+        return encode(self.get_content().encode('utf-8'), encoding)
+
+    @memoized
+    def get_encoded_content(self, encoding):
+        """ Return the processed content of the bundle, compressed with
+        `encoding`.
+
+        Args:
+            encoding: the name of the encoding (`identity`, `gzip` or
+                `br`)
+
+        Returns:
+            bytes
+        """
+        return self.encode_content(encoding)
 
     @memoized
     def get_inline_content(self, concatenate=True):
@@ -342,18 +961,105 @@ class Bundle(object):
                     `False`, the linked template is applied to each asset
                     content. (default: `True`)
         """
+        return '\n'.join(
+            [self.linked_template.format(url=url, mimetype=self.mimetype)
+             for url in self.get_linked_urls(concatenate)]
+        )
+
+    def get_linked_urls(self, concatenate=True):
+        """ Return the URLs linked by :meth:`get_linked_content`: the URL
+            of each chunk (or of the whole bundle if it's not split), or the
+            URL of each asset if `concatenate` is `False`. """
         if concatenate:
-            return self.linked_template.format(url=self.url, mimetype=self.mimetype)
-        else:
-            urls = [asset.url for asset in self.assets]
-            return '\n'.join(
-                [self.linked_template.format(url=url, mimetype=self.mimetype)
-                 for url in urls]
-            )
+            return [chunk.url for chunk in self.chunks] or [self.url]
+        return [asset.url for asset in self.assets]
+
+    @memoized
+    def get_preload_links(self, concatenate=True):
+        """ Return the values of the `Link` headers used to preload the
+            linked content of the bundle (see :meth:`get_linked_content`), or
+            an empty list if the bundle has no `preload_as` destination.
+
+            Args:
+                concatenate: If `True`, preload the concatenation of all
+                    assets. If `False`, preload each asset. (default: `True`)
+        """
+        if self.preload_as is None:
+            return []
+
+        return ['<{}>; rel=preload; as={}'.format(url, self.preload_as)
+                for url in self.get_linked_urls(concatenate)]
+
+    @memoized
+    def get_chunk_indexes(self):
+        """ Split the assets of the bundle into chunks of at most
+            `chunk_size` bytes (the assets are measured before the
+            processors applied to the concatenation).
+
+            A chunk ends after an asset chosen by :func:`is_chunk_boundary`,
+            or before an asset which would make it bigger than `chunk_size`.
+            Boundaries don't depend on the assets before them, so a modified
+            asset only changes its chunk (and the next ones until the next
+            asset chosen by :func:`is_chunk_boundary`) instead of all the
+            following chunks.
+
+            Returns:
+                a list with the indexes of the assets in each chunk, or
+                `None` if the bundle is not split
+        """
+        if self.chunk_size is None:
+            return None
+
+        entry = self.get_manifest_entry()
+        if entry is not None and 'chunks' in entry:
+            return [chunk['assets'] for chunk in entry['chunks']]
+
+        asset_processors, _ = self.split_processors()
+        executor = current_app.extensions['compressor'].executor
+        contents = executor.map(
+            lambda asset: asset.get_processed_content(tuple(asset_processors)),
+            self.assets
+        )
+
+        indexes = []
+        size = 0
+        boundary = False
+        for index, content in enumerate(contents):
+            data = content.encode('utf-8')
+            # assets are separated by a newline in a chunk
+            if indexes and not boundary and \
+                    size + 1 + len(data) <= self.chunk_size:
+                indexes[-1].append(index)
+                size += 1 + len(data)
+            else:
+                indexes.append([index])
+                size = len(data)
+            boundary = is_chunk_boundary(data, self.chunk_size)
+        return indexes
+
+    @property
+    def chunks(self):
+        """ The :class:`BundleChunk` objects of the bundle, in order, or
+        an empty list if the bundle is not split. """
+        indexes = self.get_chunk_indexes()
+        if indexes is None:
+            return []
+
+        chunks = self._chunks
+        if chunks is None or \
+                [chunk.asset_indexes for chunk in chunks] != indexes:
+            chunks = [BundleChunk(self, index, asset_indexes)
+                      for index, asset_indexes in enumerate(indexes)]
+            self._chunks = chunks
+        return chunks
 
     @property
     @memoized
     def url(self):
+        entry = self.get_manifest_entry()
+        if entry is not None:
+            return entry['url']
+
         return url_for(
             'compressor.render_bundle',
             bundle_name=self.name,
@@ -364,8 +1070,30 @@ class Bundle(object):
     @property
     @memoized
     def hash(self):
-        content = self.get_content()
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
+        entry = self.get_manifest_entry()
+        if entry is not None:
+            return entry['hash']
+
+        # when all processors of the bundle are applied to each asset, hash
+        # the processed assets without concatenating them
+        asset_processors, bundle_processors = self.split_processors()
+        if bundle_processors:
+            chunks = [self.get_content()]
+        else:
+            chunks = self.get_content_chunks(tuple(asset_processors))
+
+        return fingerprint(
+            chunks,
+            algorithm=current_app.config['COMPRESSOR_HASH_ALGORITHM'],
+            length=current_app.config['COMPRESSOR_HASH_LENGTH'],
+        )
+
+    @property
+    def output_filename(self):
+        """ Return the path of the file containing the content of the bundle,
+        relative to the output directory (same path as the URL served by the
+        blueprint). """
+        return 'bundle/{}_v{}.{}'.format(self.name, self.hash, self.extension)
 
 
 class CSSBundle(Bundle):
@@ -375,6 +1103,7 @@ class CSSBundle(Bundle):
                               'href="{url}">'
     default_mimetype = 'text/css'
     default_extension = 'css'
+    default_preload_as = 'style'
 
 
 class JSBundle(Bundle):
@@ -385,6 +1114,73 @@ class JSBundle(Bundle):
                               '</script>'
     default_mimetype = 'text/javascript'
     default_extension = 'js'
+    default_preload_as = 'script'
+
+
+class BundleChunk(Bundle):
+    """
+        A chunk of a bundle split by size (see the `chunk_size` argument of
+        :class:`Bundle`): consecutive assets of the bundle, processed like a
+        bundle with the processors of the bundle, and served with its own
+        hash and URL.
+    """
+
+    def __init__(self, bundle, index, asset_indexes):
+        """ Initializes a :class:`BundleChunk` instance.
+
+        Args:
+            bundle: the :class:`Bundle` containing the chunk
+            index: the position of the chunk in the bundle
+            asset_indexes: the indexes of the assets of the chunk in
+                `bundle.assets`
+        """
+        # `Bundle.__init__()` is not called, the assets still belong to
+        # `bundle`
+        self.bundle = bundle
+        self.index = index
+        self.asset_indexes = asset_indexes
+        self.name = bundle.name
+        self.assets = [bundle.assets[i] for i in asset_indexes]
+        self.processors = bundle.processors
+        self.inline_template = bundle.inline_template
+        self.linked_template = bundle.linked_template
+        self.mimetype = bundle.mimetype
+        self.extension = bundle.extension
+        self.incremental = bundle.incremental
+        self.preload_as = bundle.preload_as
+        self.chunk_size = None
+        self._chunks = None
+
+    def get_manifest_entry(self):
+        """ Return the entry of the chunk in the manifest, or `None` if the
+        bundle was not built ahead of time. """
+        manifest = current_app.extensions['compressor'].manifest
+        if manifest is None:
+            return None
+        return manifest.get_chunk(self.name, self.index)
+
+    @property
+    @memoized
+    def url(self):
+        entry = self.get_manifest_entry()
+        if entry is not None:
+            return entry['url']
+
+        # the URL doesn't contain the position of the chunk, which changes
+        # when a previous chunk is split or merged
+        return url_for(
+            'compressor.render_chunk',
+            bundle_name=self.name,
+            chunk_hash=self.hash,
+            bundle_extension=self.extension,
+        )
+
+    @property
+    def output_filename(self):
+        """ Return the path of the file containing the content of the
+        chunk, relative to the output directory. """
+        return 'bundle/{}/chunk/{}.{}'.format(self.name, self.hash,
+                                              self.extension)
 
 
 class Asset(object):
@@ -408,29 +1204,136 @@ class Asset(object):
         self.processors = processors or []
         self.bundle = None
 
-    def apply_processors(self, content):
+    def apply_processors(self, content, processors=None):
         """ Apply all processors to the provided content.
 
         Args:
             content: the content to be processed
+            processors: the names of the processors to apply (default: the
+                processors of the asset)
 
         Returns:
             Modified content with all processors applied
         """
+        if processors is None:
+            processors = self.processors
+
         # apply all processors
         compressor = current_app.extensions['compressor']
-        for name in self.processors:
-            processor = compressor.get_processor(name)
-            content = processor(content)
+        for name in processors:
+            content = compressor.run_processor(name, content)
 
         return content
 
+    def get_cache_key(self, processors=()):
+        """ Return a key identifying the processed content of the asset in
+        the persistent cache.
+
+        The key is built from the raw content and the processors (names and
+        versions) of the asset.
+
+        Args:
+            processors: the names of the processors applied to the content of
+                the asset (see :meth:`get_processed_content`)
+        """
+        compressor = current_app.extensions['compressor']
+        return make_cache_key('asset', self.raw_content,
+                              compressor.get_processor_versions(
+                                  self.processors
+                              ),
+                              current_app.debug,
+                              compressor.get_processor_versions(processors))
+
+    def get_source_signature(self):
+        """ Return a value which changes each time the source of the asset is
+        modified. Used in debug mode to invalidate memoized values.
+
+        The content of an :class:`Asset` never changes, so the signature is
+        always `None`.
+        """
+        return None
+
+    def get_identity(self):
+        """ Return a value identifying the source and the processors of the
+        asset, equal for assets of different bundles with the same content
+        (see :meth:`Compressor.extract_common_bundles`). """
+        return ('content', self._raw_content, tuple(self.processors))
+
+    def get_manifest_entry(self):
+        """ Return the entry of the asset in the manifest, or `None` if the
+        asset was not built ahead of time. """
+        manifest = current_app.extensions['compressor'].manifest
+        if manifest is None or self.bundle is None:
+            return None
+        return manifest.get_asset(self.bundle.name,
+                                  self.bundle.assets.index(self))
+
     @property
     @memoized
     def content(self):
         """ Return the content of the asset after being altered by the
         processors. """
-        return self.apply_processors(self.raw_content)
+        entry = self.get_manifest_entry()
+        if entry is not None:
+            manifest = current_app.extensions['compressor'].manifest
+            return manifest.read(entry)
+
+        cache = current_app.extensions['compressor'].cache
+        return cache.get_or_set(
+            self.get_cache_key(),
+            lambda: self.apply_processors(self.raw_content)
+        )
+
+    def aget_content(self):
+        """ Asynchronous version of :attr:`content`, returns a coroutine (see
+        :meth:`Bundle.aget_content`). """
+        from .aio import get_asset_content
+        return get_asset_content(self)
+
+    @memoized
+    def get_processed_content(self, processors=()):
+        """ Return the content of the asset, altered by additional processors
+        (usually the processors of the bundle).
+
+        Args:
+            processors: a tuple with the names of the processors to apply
+                after the processors of the asset (default: `()`)
+        """
+        if not processors:
+            return self.content
+
+        cache = current_app.extensions['compressor'].cache
+        return cache.get_or_set(
+            self.get_cache_key(processors),
+            lambda: self.apply_processors(self.content, processors)
+        )
+
+    def encode_content(self, encoding):
+        """ Compress the processed content of the asset with `encoding`.
+        The result is not memoized, see :meth:`get_encoded_content`.
+
+        Args:
+            encoding: the name of the encoding (`identity`, `gzip` or
+                `br`)
+
+        Returns:
+            bytes
+        """
+        return encode(self.content.encode('utf-8'), encoding)
+
+    @memoized
+    def get_encoded_content(self, encoding):
+        """ Return the processed content of the asset, compressed with
+        `encoding`.
+
+        Args:
+            encoding: the name of the encoding (`identity`, `gzip` or
+                `br`)
+
+        Returns:
+            bytes
+        """
+        return self.encode_content(encoding)
 
     @property
     def name(self):
@@ -445,6 +1348,10 @@ class Asset(object):
     @property
     @memoized
     def url(self):
+        entry = self.get_manifest_entry()
+        if entry is not None:
+            return entry['url']
+
         return url_for(
             'compressor.render_asset',
             bundle_name=self.bundle.name,
@@ -457,7 +1364,25 @@ class Asset(object):
     @property
     @memoized
     def hash(self):
-        return hashlib.md5(self.content.encode('utf-8')).hexdigest()
+        entry = self.get_manifest_entry()
+        if entry is not None:
+            return entry['hash']
+
+        return fingerprint(
+            [self.content],
+            algorithm=current_app.config['COMPRESSOR_HASH_ALGORITHM'],
+            length=current_app.config['COMPRESSOR_HASH_LENGTH'],
+        )
+
+    @property
+    def output_filename(self):
+        """ Return the path of the file containing the content of the asset,
+        relative to the output directory (same path as the URL served by the
+        blueprint). """
+        return 'bundle/{}/asset/{}_v{}.{}'.format(
+            self.bundle.name, self.bundle.assets.index(self), self.hash,
+            self.bundle.extension
+        )
 
 
 class FileAsset(Asset):
@@ -482,12 +1407,27 @@ class FileAsset(Asset):
         self.filename = filename
         super(FileAsset, self).__init__(None, *args, **kwargs)
 
+    @property
+    def path(self):
+        """ Return the absolute path of the file `self.filename`. """
+        return os.path.join(current_app.static_folder, self.filename)
+
+    def get_source_signature(self):
+        """ Return the modification time and the size of the file
+        `self.filename`. """
+        stat = os.stat(self.path)
+        return (stat.st_mtime, stat.st_size)
+
+    def get_identity(self):
+        """ Return a value identifying the file and the processors of the
+        asset. """
+        return ('file', self.filename, tuple(self.processors))
+
     @property
     @memoized
     def raw_content(self):
         """ Return the content of the file `self.filename`. """
-        abs_path = os.path.join(current_app.static_folder, self.filename)
-        with open(abs_path) as handle:
+        with open(self.path) as handle:
             self._raw_content = handle.read()
         return self._raw_content
 
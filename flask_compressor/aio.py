@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Asynchronous processing pipeline for the Flask-Compressor extension.
+
+    Contents processed here are shared with the synchronous methods of
+    bundles and assets (same memory and persistent caches). Coroutine
+    processors are awaited, the `lesscss` processor runs `lessc` with
+    :func:`asyncio.create_subprocess_exec`, and other processors run in the
+    default executor of the event loop.
+
+    Requires Python 3.7 or later.
+
+"""
+
+import asyncio
+import inspect
+import functools
+import contextvars
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from . import Bundle, Asset, _missing
+from .exceptions import CompressorProcessorException
+from .metrics import timer
+from .signals import processor_called
+from .processors import lesscss
+
+
+def run_sync(processor, content):
+    """ Call the coroutine function `processor` with `content` from
+    synchronous code, and return the processed content.
+
+    If an event loop is already running in the current thread (in an async
+    view, for example), the coroutine runs in a new event loop in another
+    thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(processor(content))
+
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(context.run, asyncio.run,
+                           processor(content)).result()
+
+
+async def run_in_thread(func, *args):
+    """ Call `func` in the default executor of the event loop, in the
+    context (Flask application) of the caller. """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        None, functools.partial(context.run, func, *args)
+    )
+
+
+async def alesscss(content):
+    """ Asynchronous version of the `lesscss` processor (see
+    :func:`flask_compressor.processors.lesscss`). """
+    compressor = current_app.extensions.get('compressor')
+    if compressor is not None and compressor.lessc_pool is not None:
+        return await run_in_thread(compressor.lessc_pool.compile, content)
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            'lessc', '--no-color', '-',
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    except OSError as e:
+        # error when invoking the lessc command
+        raise CompressorProcessorException("Error when invoking the 'lessc' "
+                                           "command: " + e.strerror)
+
+    stdout, stderr = await process.communicate(input=content.encode('utf-8'))
+
+    if process.returncode != 0:
+        raise CompressorProcessorException("Error with 'lesscss': " +
+                                           stderr.decode('utf-8'))
+
+    return stdout.decode('utf-8')
+
+
+#: asynchronous versions of synchronous processors, used in place of them by
+#: :func:`run_processor`
+ASYNC_PROCESSORS = {
+    lesscss: alesscss,
+}
+
+
+async def run_processor(name, content):
+    """ Asynchronous version of
+    :meth:`flask_compressor.Compressor.run_processor`. """
+    compressor = current_app.extensions['compressor']
+    processor = compressor.get_processor(name)
+
+    key = compressor.get_processor_cache_key(name, processor, content)
+    if key is not None:
+        value = compressor.processor_cache.get(key, _missing)
+        if value is not _missing:
+            return value
+
+    processor = ASYNC_PROCESSORS.get(processor, processor)
+    start = timer()
+    if inspect.iscoroutinefunction(processor):
+        content = await processor(content)
+    else:
+        content = await run_in_thread(compressor.executor.run_processor,
+                                      processor, content)
+    processor_called.send(current_app._get_current_object(), name=name,
+                          duration=timer() - start)
+
+    if key is not None:
+        compressor.processor_cache.set(key, content)
+    return content
+
+
+async def run_processors(content, processors):
+    """ Apply `processors` (a list of names) to `content`, one after the
+    other. """
+    for name in processors:
+        content = await run_processor(name, content)
+    return content
+
+
+async def get_asset_content(asset):
+    """ Asynchronous version of :attr:`flask_compressor.Asset.content`. """
+    memoized = Asset.content.fget
+    content = memoized.get_cached(asset)
+    if content is not _missing:
+        return content
+
+    compressor = current_app.extensions['compressor']
+    entry = asset.get_manifest_entry()
+    if entry is not None:
+        content = compressor.manifest.read(entry)
+    else:
+        key = asset.get_cache_key()
+        content = compressor.cache.get(key)
+        if content is None:
+            content = await run_processors(asset.raw_content,
+                                           asset.processors)
+            compressor.cache.set(key, content)
+
+    memoized.set_cached(content, asset)
+    return content
+
+
+async def get_processed_content(asset, processors=()):
+    """ Asynchronous version of
+    :meth:`flask_compressor.Asset.get_processed_content`. """
+    if not processors:
+        return await get_asset_content(asset)
+
+    memoized = Asset.get_processed_content
+    content = memoized.get_cached(asset, processors)
+    if content is not _missing:
+        return content
+
+    cache = current_app.extensions['compressor'].cache
+    key = asset.get_cache_key(processors)
+    content = cache.get(key)
+    if content is None:
+        content = await run_processors(await get_asset_content(asset),
+                                       processors)
+        cache.set(key, content)
+
+    memoized.set_cached(content, asset, processors)
+    return content
+
+
+async def get_bundle_content(bundle, apply_processors=True):
+    """ Asynchronous version of :meth:`flask_compressor.Bundle.get_content`.
+
+    Assets are processed concurrently.
+    """
+    # same arguments as the synchronous calls, so the memoized value is
+    # shared with them
+    args = () if apply_processors else (False,)
+    memoized = Bundle.get_content
+    content = memoized.get_cached(bundle, *args)
+    if content is not _missing:
+        return content
+
+    compressor = current_app.extensions['compressor']
+    entry = bundle.get_manifest_entry()
+    if entry is not None and apply_processors:
+        content = compressor.manifest.read(entry)
+    else:
+        key = bundle.get_cache_key('content', apply_processors)
+        content = compressor.cache.get(key)
+        if content is None:
+            content = await _process_bundle(bundle, apply_processors)
+            compressor.cache.set(key, content)
+
+    memoized.set_cached(content, bundle, *args)
+    return content
+
+
+async def _process_bundle(bundle, apply_processors):
+    """ Process the assets of `bundle` concurrently, and apply the remaining
+    processors to the concatenation. """
+    if apply_processors:
+        asset_processors, bundle_processors = bundle.split_processors()
+    else:
+        asset_processors, bundle_processors = [], []
+
+    contents = await asyncio.gather(*[
+        get_processed_content(asset, tuple(asset_processors))
+        for asset in bundle.assets
+    ])
+    return await run_processors('\n'.join(contents), bundle_processors)
@@ -6,12 +6,294 @@
 
 from __future__ import unicode_literals, absolute_import, division, \
     print_function
-from flask import Blueprint, current_app, abort, Response
+import os
+import uuid
+from flask import Blueprint, current_app, abort, request, jsonify, Response
+from werkzeug.wsgi import wrap_file
+from werkzeug.datastructures import ContentRange
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 from .exceptions import CompressorException
+from .encoding import get_available_encodings, FILE_SUFFIXES
+from .manifest import write_file
+from .cache import FileLocks
+from .metrics import to_prometheus
+from .signals import content_served
 
 
 blueprint = Blueprint('compressor', __name__)
 
+#: headers used to ask the front server to send a file, indexed by the value
+#: of the `COMPRESSOR_SENDFILE` configuration value
+SENDFILE_HEADERS = {
+    None: None,
+    'x-sendfile': 'X-Sendfile',
+    'x-accel-redirect': 'X-Accel-Redirect',
+}
+
+
+#: maximum number of ranges in a `Range` header, the header is ignored if
+#: there are more ranges
+MAX_RANGES = 16
+
+
+def iter_chunks(data, chunk_size):
+    """ Iterate over `data` (bytes), `chunk_size` bytes at a time. """
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+def read_range(source, start, stop):
+    """ Return the bytes from `start` to `stop` (excluded) of `source`, the
+    content itself (bytes) or the path of a file containing it. """
+    if isinstance(source, bytes):
+        return source[start:stop]
+    with open(source, 'rb') as handle:
+        handle.seek(start)
+        return handle.read(stop - start)
+
+
+def get_byte_ranges(length, etag):
+    """ Return the ranges requested with the `Range` header, as a list of
+    `(start, stop)` tuples (`stop` is excluded), or `None` if the whole
+    content must be sent.
+
+    The `Range` header is ignored if it's malformed, if it contains more
+    than `MAX_RANGES` ranges, or if the `If-Range` header doesn't match
+    `etag` (dates never match, since responses have no `Last-Modified`
+    header).
+
+    Raises:
+        RequestedRangeNotSatisfiable: if no range overlaps the content
+    """
+    byte_range = request.range
+    if byte_range is None or byte_range.units != 'bytes' or \
+            len(byte_range.ranges) > MAX_RANGES:
+        return None
+
+    if 'If-Range' in request.headers and request.if_range.etag != etag:
+        return None
+
+    ranges = []
+    for start, stop in byte_range.ranges:
+        if start < 0:
+            # the last `-start` bytes
+            start, stop = max(length + start, 0), length
+        else:
+            stop = length if stop is None else min(stop, length)
+        if start < stop:
+            ranges.append((start, stop))
+
+    if not ranges:
+        raise RequestedRangeNotSatisfiable(length=length)
+    return ranges
+
+
+def make_multipart_body(source, ranges, length, mimetype, boundary):
+    """ Return the parts of a `multipart/byteranges` body, and its length.
+    """
+    parts = []
+    for start, stop in ranges:
+        parts.append(
+            '--{}\r\nContent-Type: {}\r\nContent-Range: bytes {}-{}/{}\r\n'
+            '\r\n'.format(boundary, mimetype, start, stop - 1,
+                          length).encode('ascii')
+        )
+        parts.append(read_range(source, start, stop))
+        parts.append(b'\r\n')
+    parts.append('--{}--\r\n'.format(boundary).encode('ascii'))
+    return parts, sum(len(part) for part in parts)
+
+
+def get_content_file(obj, encoding):
+    """ Return the file containing the content of a bundle or an asset.
+
+    If the bundle or the asset was built ahead of time, the file from the
+    build is used (the content compressed with `encoding` is also read from
+    the build, if the build contains this encoding). Otherwise, if the
+    `COMPRESSOR_OUTPUT_DIR` configuration value is set, the content is
+    written in this directory the first time it's requested. Filenames
+    contain the hash of the content, so a file is never written twice, even
+    by several processes sharing the directory.
+
+    Args:
+        obj: a :class:`flask_compressor.Bundle` or a
+            :class:`flask_compressor.Asset` object
+        encoding: the name of the encoding, or `None` for the content itself
+
+    Returns:
+        a `(root, filename)` tuple, `filename` being relative to the `root`
+        directory, or `None` if the content is not available in a file
+    """
+    entry = obj.get_manifest_entry()
+    if entry is not None:
+        manifest = current_app.extensions['compressor'].manifest
+        if encoding is not None:
+            entry = manifest.get_encoded(entry, encoding)
+        if entry is not None:
+            return manifest.root, entry['filename']
+
+    output_dir = current_app.config['COMPRESSOR_OUTPUT_DIR']
+    if output_dir is None:
+        return None
+
+    filename = obj.output_filename + FILE_SUFFIXES[encoding or 'identity']
+    path = os.path.join(output_dir, *filename.split('/'))
+    if not os.path.exists(path):
+        # the directory may be shared by several processes, the file is
+        # written by the first one. The encoded content is served from the
+        # file, it's not kept in memory.
+        locks = FileLocks(os.path.join(output_dir, '.locks'))
+        with locks.lock(filename):
+            if not os.path.exists(path):
+                write_file(output_dir, filename,
+                           obj.encode_content(encoding or 'identity'))
+        # the file exists, the lock is not needed anymore
+        locks.remove(filename)
+    return os.path.abspath(output_dir), filename
+
+
+def make_body_response(obj, encoding, mimetype, etag):
+    """ Return a response with the content of a bundle or an asset.
+
+    If the content is available in a file (see :func:`get_content_file`),
+    the file is served with `wsgi.file_wrapper` (zero-copy with most WSGI
+    servers). With the `COMPRESSOR_SENDFILE` configuration value, the body
+    is left empty and the front server is asked to send the file with the
+    `X-Sendfile` or `X-Accel-Redirect` header.
+
+    Otherwise, the cached encoded content is streamed by chunks of
+    `COMPRESSOR_STREAM_CHUNK_SIZE` bytes, so the content is never copied as
+    a whole for a response.
+
+    If the client requests ranges of the content (`Range` header), a
+    response with the status code 206 is returned with only these ranges
+    (several ranges are sent as a `multipart/byteranges` body). With
+    `COMPRESSOR_SENDFILE`, ranges are handled by the front server.
+
+    Args:
+        obj: a :class:`flask_compressor.Bundle` or a
+            :class:`flask_compressor.Asset` object
+        encoding: the name of the encoding, or `None` for the content itself
+        mimetype: the mimetype of the response
+        etag: the ETag of the response, compared with the `If-Range` header
+
+    Raises:
+        RequestedRangeNotSatisfiable: if the requested ranges don't overlap
+            the content
+    """
+    chunk_size = current_app.config['COMPRESSOR_STREAM_CHUNK_SIZE']
+    sendfile = current_app.config['COMPRESSOR_SENDFILE']
+
+    content_file = get_content_file(obj, encoding)
+    if content_file is not None:
+        root, filename = content_file
+        path = os.path.join(root, *filename.split('/'))
+
+        if sendfile is not None:
+            response = Response(mimetype=mimetype, direct_passthrough=True)
+            if sendfile == 'x-accel-redirect':
+                prefix = current_app.config[
+                    'COMPRESSOR_X_ACCEL_REDIRECT_PREFIX'
+                ]
+                value = '{}/{}'.format(prefix.rstrip('/'), filename)
+            else:
+                value = path
+            response.headers[SENDFILE_HEADERS[sendfile]] = value
+            response.content_length = os.path.getsize(path)
+            return response
+
+        source = path
+        length = os.path.getsize(path)
+    else:
+        source = obj.get_encoded_content(encoding or 'identity')
+        length = len(source)
+
+    ranges = get_byte_ranges(length, etag)
+    if ranges is None:
+        if isinstance(source, bytes):
+            if chunk_size is None or length <= chunk_size:
+                body = [source]
+            else:
+                body = iter_chunks(source, chunk_size)
+        else:
+            body = wrap_file(request.environ, open(source, 'rb'),
+                             chunk_size or 8192)
+        response = Response(body, mimetype=mimetype, direct_passthrough=True)
+        response.content_length = length
+    elif len(ranges) == 1:
+        start, stop = ranges[0]
+        response = Response([read_range(source, start, stop)], status=206,
+                            mimetype=mimetype, direct_passthrough=True)
+        response.content_length = stop - start
+        response.content_range = ContentRange('bytes', start, stop, length)
+    else:
+        boundary = uuid.uuid4().hex
+        body, body_length = make_multipart_body(source, ranges, length,
+                                                mimetype, boundary)
+        response = Response(body, status=206, direct_passthrough=True,
+                            mimetype='multipart/byteranges')
+        response.mimetype_params['boundary'] = boundary
+        response.content_length = body_length
+
+    response.accept_ranges = 'bytes'
+    return response
+
+
+def make_content_response(obj, content_hash, mimetype):
+    """ Build the response for a bundle or an asset.
+
+    If the client accepts one of the encodings listed in the
+    `COMPRESSOR_ENCODINGS` configuration value, the content compressed ahead
+    of time is used.
+
+    The hash of the content is used as a strong ETag. If the client already
+    has the content (`If-None-Match` header), an empty response with the
+    status code 304 is returned.
+
+    Args:
+        obj: a :class:`flask_compressor.Bundle` or a
+            :class:`flask_compressor.Asset` object
+        content_hash: the hash of the content
+        mimetype: the mimetype of the response
+    """
+    encodings = get_available_encodings(
+        current_app.config['COMPRESSOR_ENCODINGS']
+    )
+    encoding = request.accept_encodings.best_match(encodings)
+
+    # each encoding is a different representation of the content, with its
+    # own ETag
+    if encoding is None:
+        etag = content_hash
+    else:
+        etag = '{}-{}'.format(content_hash, encoding)
+
+    if request.if_none_match.contains_weak(etag):
+        # the client already has the content
+        response = Response(status=304, mimetype=mimetype)
+    else:
+        response = make_body_response(obj, encoding, mimetype, etag)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+
+    # URLs contain the hash of the content, so the content never changes
+    # for a given URL. This is not true in debug mode, where the content
+    # changes each time a source file is modified.
+    if current_app.debug:
+        response.headers['Cache-Control'] = \
+            current_app.config['COMPRESSOR_DEBUG_CACHE_CONTROL']
+    else:
+        response.headers['Cache-Control'] = \
+            current_app.config['COMPRESSOR_CACHE_CONTROL']
+
+    if encodings:
+        # the response depends on the `Accept-Encoding` header
+        response.vary.add('Accept-Encoding')
+
+    return response
+
 
 @blueprint.route('/bundle/<bundle_name>_v<bundle_hash>.<bundle_extension>')
 def render_bundle(bundle_name, bundle_hash, bundle_extension):
@@ -38,8 +320,45 @@ def render_bundle(bundle_name, bundle_hash, bundle_extension):
     if bundle.extension != bundle_extension:
         abort(404)
 
-    content = bundle.get_content()
-    return Response(content, mimetype=bundle.mimetype)
+    response = make_content_response(bundle, bundle_hash, bundle.mimetype)
+    content_served.send(current_app._get_current_object(), kind='bundle',
+                        name=bundle_name, response=response)
+    return response
+
+
+@blueprint.route('/bundle/<bundle_name>/chunk/<chunk_hash>.<bundle_extension>')
+def render_chunk(bundle_name, bundle_extension, chunk_hash):
+    """ Render a chunk of a bundle split by size.
+
+    Args:
+        bundle_name: name of the bundle to render
+        bundle_extension: file extension for the bundle
+        chunk_hash: calculated hash from chunk content, identifying the chunk
+            in `Bundle.chunks`
+    """
+    compressor = current_app.extensions['compressor']
+
+    try:
+        bundle = compressor.get_bundle(bundle_name)
+    except CompressorException:
+        # bundle not found
+        abort(404)
+
+    for chunk in bundle.chunks:
+        if chunk.hash == chunk_hash:
+            break
+    else:
+        # chunk not found
+        abort(404)
+
+    # check the extension
+    if bundle.extension != bundle_extension:
+        abort(404)
+
+    response = make_content_response(chunk, chunk_hash, bundle.mimetype)
+    content_served.send(current_app._get_current_object(), kind='chunk',
+                        name=bundle_name, response=response)
+    return response
 
 
 @blueprint.route('/bundle/<bundle_name>/asset/<int:asset_index>_v<asset_hash>.<bundle_extension>')
@@ -74,5 +393,38 @@ def render_asset(bundle_name, bundle_extension, asset_index, asset_hash):
     if bundle.extension != bundle_extension:
         abort(404)
 
-    content = asset.content
-    return Response(content, mimetype=bundle.mimetype)
+    response = make_content_response(asset, asset_hash, bundle.mimetype)
+    content_served.send(current_app._get_current_object(), kind='asset',
+                        name=bundle_name, response=response)
+    return response
+
+
+@blueprint.route('/ready')
+def render_ready():
+    """ Render the progress of the warm-up started by
+    :meth:`flask_compressor.Compressor.warm`, as JSON. The status code is
+    503 until the warm-up is finished. """
+    warm_up = current_app.extensions['compressor'].warm_up
+    if warm_up is None:
+        # nothing to wait for
+        return jsonify({'ready': True})
+
+    response = jsonify(warm_up.to_dict())
+    if not warm_up.is_ready():
+        response.status_code = 503
+    return response
+
+
+@blueprint.route('/stats')
+def render_stats():
+    """ Render the metrics collected by the extension, as JSON or with the
+    Prometheus text format (with `?format=prometheus`). Only available if
+    `COMPRESSOR_STATS` is enabled. """
+    stats = current_app.extensions['compressor'].get_stats()
+    if stats is None:
+        abort(404)
+
+    if request.args.get('format') == 'prometheus':
+        return Response(to_prometheus(stats),
+                        mimetype='text/plain; version=0.0.4')
+    return jsonify(stats)
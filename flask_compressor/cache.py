@@ -0,0 +1,528 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Cache backends for the Flask-Compressor extension.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import os
+import sys
+import errno
+import hashlib
+import tempfile
+import weakref
+import threading
+import contextlib
+from collections import OrderedDict, deque
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows
+    fcntl = None
+
+
+def make_cache_key(*parts):
+    """ Build a cache key from several parts.
+
+    Each part can be a string, `None`, a boolean or a list (or tuple) of
+    those. The key is a hexadecimal digest, so it can safely be used as a
+    filename.
+
+    Args:
+        parts: the values identifying a cached result
+
+    Returns:
+        a string
+    """
+    digest = hashlib.sha1()
+
+    def update(part):
+        if isinstance(part, (list, tuple)):
+            digest.update(b'[')
+            for item in part:
+                update(item)
+            digest.update(b']')
+            return
+        if not isinstance(part, bytes):
+            part = '{}'.format(part).encode('utf-8')
+        # prefix each part with its length, so ('ab', 'c') and ('a', 'bc')
+        # don't produce the same key
+        digest.update('{}:'.format(len(part)).encode('utf-8'))
+        digest.update(part)
+
+    for part in parts:
+        update(part)
+
+    return digest.hexdigest()
+
+
+def get_size(value):
+    """ Return an estimation of the memory used by `value`, in bytes.
+
+    Lists and tuples are measured with their items, other objects with
+    :func:`sys.getsizeof`.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(get_size(item) for item in value)
+    return size
+
+
+class LRUCache(object):
+    """ An in-memory cache, bounded by a number of entries and a size in
+    bytes. When a limit is exceeded, the least recently used entries are
+    evicted.
+
+    An entry can be attached to an owner object (a bundle or an asset): the
+    cache only keeps a weak reference to the owner, and all entries attached
+    to the owner are removed when it's garbage collected.
+
+    The cache counts hits, misses and evictions, see :meth:`get_stats`.
+    """
+
+    def __init__(self, max_entries=1024, max_size=None):
+        """ Initializes a :class:`LRUCache` instance.
+
+        Args:
+            max_entries: the maximum number of entries, or `None` for no
+                limit (default: 1024)
+            max_size: the maximum size of all values (as estimated by
+                :func:`get_size`), in bytes, or `None` for no limit (default:
+                `None`)
+        """
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (value, size, weak reference to the owner)
+        self._data = OrderedDict()
+        # weak reference to an owner -> (same reference, set of keys)
+        self._owners = {}
+        # weak references to garbage collected owners. They are appended by
+        # weakref callbacks, which may run at any time (even when the lock is
+        # held), so entries are removed later by `_remove_dead_owners()`.
+        self._dead_owners = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None, count=True):
+        """ Return the value stored for `key`, or `default`. Use
+        `count=False` to not count the lookup in hits and misses. """
+        with self._lock:
+            self._remove_dead_owners()
+            try:
+                entry = self._data.pop(key)
+            except KeyError:
+                if count:
+                    self.misses += 1
+                return default
+
+            # move the entry at the end (most recently used)
+            self._data[key] = entry
+            if count:
+                self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, owner=None):
+        """ Store `value` for `key`, and evict the least recently used
+        entries if the cache is full.
+
+        Args:
+            key: the key
+            value: the value
+            owner: if not `None`, the value is removed from the cache when
+                `owner` is garbage collected
+        """
+        size = get_size(value)
+        with self._lock:
+            self._remove_dead_owners()
+            self._delete(key)
+
+            owner_ref = None
+            if owner is not None:
+                owner_ref = weakref.ref(owner, self._dead_owners.append)
+                if owner_ref not in self._owners:
+                    self._owners[owner_ref] = (owner_ref, set())
+                # use the reference already known for this owner, so its
+                # callback is called only once
+                owner_ref, keys = self._owners[owner_ref]
+                keys.add(key)
+
+            self._data[key] = (value, size, owner_ref)
+            self.size += size
+            self._prune()
+
+    def delete(self, key):
+        """ Remove the value stored for `key`, if any. """
+        with self._lock:
+            self._delete(key)
+
+    def clear(self):
+        """ Remove all values from the cache. """
+        with self._lock:
+            self._data.clear()
+            self._owners.clear()
+            self.size = 0
+
+    def _delete(self, key):
+        """ Remove the value stored for `key`, if any. Must be called with
+        the lock held. """
+        try:
+            _, size, owner_ref = self._data.pop(key)
+        except KeyError:
+            return False
+
+        self.size -= size
+        if owner_ref is not None:
+            _, keys = self._owners[owner_ref]
+            keys.discard(key)
+            if not keys:
+                del self._owners[owner_ref]
+        return True
+
+    def _remove_dead_owners(self):
+        """ Remove entries attached to garbage collected owners. Must be
+        called with the lock held. """
+        while self._dead_owners:
+            owner_ref = self._dead_owners.popleft()
+            _, keys = self._owners.pop(owner_ref, (None, ()))
+            for key in keys:
+                _, size, _ = self._data.pop(key)
+                self.size -= size
+
+    def _prune(self):
+        """ Evict the least recently used entries until the cache is within
+        its limits. Must be called with the lock held. """
+        while self._data and (
+            (self.max_entries is not None
+             and len(self._data) > self.max_entries)
+            or (self.max_size is not None and self.size > self.max_size)
+        ):
+            self._delete(next(iter(self._data)))
+            self.evictions += 1
+
+    def get_stats(self):
+        """ Return a dict with statistics about the cache: `hits`, `misses`,
+        `evictions`, `entries` and `size`. """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._data),
+            'size': self.size,
+        }
+
+
+class _Flight(object):
+    """ A call in progress in a :class:`SingleFlight` object. """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """ Run a function only once for concurrent calls with the same key.
+
+    The first caller for a key runs the function, the other callers wait for
+    its result. If the function raises an exception, the waiting callers
+    raise the same exception. Nothing is kept once the call is finished: the
+    next call for the key runs the function again. Calls with different keys
+    run in parallel.
+    """
+
+    def __init__(self):
+        # key -> _Flight
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._flights)
+
+    def do(self, key, func):
+        """ Call `func` (without arguments) and return its return value, or
+        wait for the call in progress for `key` and return its return
+        value. """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = func()
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class FileLocks(object):
+    """ Locks shared by all processes of a host, implemented with `flock()`
+    on files in a directory.
+
+    Each name has its own lock file, so nested locks (a bundle locked while
+    its assets are locked) never wait for each other. Lock files are kept
+    until :meth:`remove` is called.
+
+    Locks are not available on platforms without :mod:`fcntl`: :meth:`lock`
+    doesn't lock anything there.
+    """
+
+    def __init__(self, lock_dir):
+        """ Initializes a :class:`FileLocks` instance.
+
+        Args:
+            lock_dir: the directory of the lock files, created when a lock is
+                first acquired
+        """
+        self.lock_dir = lock_dir
+
+    def _get_filename(self, name):
+        """ Return the path of the lock file used for `name`. """
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.lock_dir, '{}.lock'.format(digest))
+
+    def remove(self, name):
+        """ Remove the lock file of `name`, once the locked resource is
+        removed. A process waiting for the lock still gets it. """
+        try:
+            os.remove(self._get_filename(name))
+        except OSError:
+            pass
+
+    @contextlib.contextmanager
+    def lock(self, name):
+        """ Hold the lock of `name` in the `with` block.
+
+        Locks are an optimization: if the lock file can't be opened, the
+        block is run without lock.
+        """
+        if fcntl is None:
+            yield
+            return
+
+        try:
+            try:
+                os.makedirs(self.lock_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            handle = open(self._get_filename(name), 'a')
+        except (IOError, OSError):
+            yield
+            return
+
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            yield
+        finally:
+            # closing the file releases the lock
+            handle.close()
+
+
+class NullCache(object):
+    """ A cache that doesn't cache anything. Used when no cache is
+    configured. """
+
+    def get(self, key):
+        """ Return the value stored for `key`, or `None`. """
+        return None
+
+    def set(self, key, value):
+        """ Store `value` for `key`. """
+        pass
+
+    def clear(self):
+        """ Remove all values from the cache. """
+        pass
+
+    def get_or_set(self, key, func):
+        """ Return the value stored for `key`. If there is no value, call
+        `func` (without arguments), store its return value and return it. """
+        return func()
+
+
+class FileSystemCache(NullCache):
+    """ A cache storing values in files in a directory.
+
+    Values are text strings, stored UTF-8 encoded in a file named after the
+    cache key. Keys are expected to be built from the source of the cached
+    value (see :func:`make_cache_key`), so a stored file never needs to be
+    invalidated: it is simply not read anymore when the source changes, and
+    it's eventually evicted when the cache grows beyond `max_size`.
+
+    The directory can be shared by several processes (the workers of a WSGI
+    server, for example): :meth:`get_or_set` holds a lock shared by all
+    processes of the host while computing a missing value, so a value is
+    computed by one process and read by the others.
+    """
+
+    #: suffix of the files managed by the cache
+    suffix = '.cache'
+
+    def __init__(self, cache_dir, max_size=100 * 1024 * 1024):
+        """ Initializes a :class:`FileSystemCache` instance.
+
+        Args:
+            cache_dir: the directory used to store cached values, created if
+                it doesn't exist
+            max_size: the maximum size, in bytes, of the cache directory.
+                When the limit is exceeded, the least recently used values
+                are removed. Use `None` for an unbounded cache. (default:
+                100MB)
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.locks = FileLocks(os.path.join(cache_dir, 'locks'))
+
+        try:
+            os.makedirs(cache_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _get_filename(self, key):
+        """ Return the path of the file used to store the value of `key`. """
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def _remove_file(self, path):
+        """ Remove the file of a value, and its lock file. """
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        key = os.path.basename(path)[:-len(self.suffix)]
+        self.locks.remove(key)
+
+    def _list_files(self):
+        """ Return a list of `(mtime, size, path)` tuples, one for each file
+        managed by the cache. """
+        files = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(self.suffix):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # removed by another process
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _read(self, key):
+        """ Return the value stored for `key`, or `None`, without counting
+        hits and misses. """
+        filename = self._get_filename(key)
+        try:
+            with open(filename, 'rb') as handle:
+                value = handle.read().decode('utf-8')
+        except (IOError, OSError):
+            return None
+
+        # mark the file as recently used
+        try:
+            os.utime(filename, None)
+        except OSError:
+            pass
+
+        return value
+
+    def get(self, key):
+        """ Return the value stored for `key`, or `None`. """
+        value = self._read(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def get_or_set(self, key, func):
+        """ Return the value stored for `key`. If there is no value, call
+        `func` (without arguments), store its return value and return it.
+
+        Processes calling this method at the same time for the same key
+        wait for the first one, then read the value it stored.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self.locks.lock(key):
+            # the value may have been stored while waiting for the lock
+            value = self._read(key)
+            if value is None:
+                value = func()
+                self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        """ Store `value` for `key`.
+
+        The value is written in a temporary file which is then renamed, so
+        concurrent readers never see a partially written value.
+        """
+        fd, tmp_filename = tempfile.mkstemp(dir=self.cache_dir,
+                                            suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                handle.write(value.encode('utf-8'))
+            os.rename(tmp_filename, self._get_filename(key))
+        except (IOError, OSError):
+            # the cache is an optimization, failing to write a value must not
+            # break the application
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
+            return
+
+        if self.max_size is not None:
+            self.prune()
+
+    def prune(self):
+        """ Remove the least recently used values until the size of the
+        cache directory is below `max_size`. """
+        files = self._list_files()
+        total_size = sum(size for _, size, _ in files)
+
+        for _, size, path in sorted(files):
+            if total_size <= self.max_size:
+                break
+            self._remove_file(path)
+            total_size -= size
+
+    def get_stats(self):
+        """ Return a dict with statistics about the cache: `hits`, `misses`
+        and `entries`. """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._list_files()),
+        }
+
+    def clear(self):
+        """ Remove all values from the cache. """
+        for _, _, path in self._list_files():
+            self._remove_file(path)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Command line interface for the Flask-Compressor extension.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+
+compressor_cli = AppGroup('compressor',
+                          help='Manage the Flask-Compressor bundles.')
+
+
+@compressor_cli.command('build')
+@click.argument('output_dir', type=click.Path(file_okay=False))
+def build_command(output_dir):
+    """ Process all registered bundles and write them in OUTPUT_DIR. """
+    compressor = current_app.extensions['compressor']
+    manifest = compressor.build(output_dir)
+
+    for name in sorted(manifest.bundles):
+        entry = manifest.bundles[name]
+        click.echo('{} -> {} ({} bytes)'.format(name, entry['filename'],
+                                                entry['size']))
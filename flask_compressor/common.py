@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Extraction of the assets shared by several bundles into common bundles,
+    so browsers download and cache them once.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import copy
+
+
+def copy_bundle(bundle, name, assets):
+    """ Return a copy of `bundle` (same class and options) named `name` and
+    containing copies of `assets`.
+
+    Assets are copied since they belong to a single bundle (their URL is
+    built from the bundle and their position in the bundle).
+    """
+    new_bundle = copy.copy(bundle)
+    new_bundle.name = name
+    new_bundle.assets = [copy.copy(asset) for asset in assets]
+    new_bundle._chunks = None
+    for asset in new_bundle.assets:
+        asset.bundle = new_bundle
+    return new_bundle
+
+
+def get_bundle_kind(bundle):
+    """ Return a key identifying the bundles whose assets can be moved to the
+    same common bundle: same class, mimetype, templates and processors. """
+    return (type(bundle), bundle.mimetype, bundle.extension,
+            bundle.inline_template, bundle.linked_template,
+            tuple(bundle.processors), bundle.incremental)
+
+
+def get_shared_segments(bundles, min_bundles):
+    """ Find the leading assets shared by at least `min_bundles` bundles.
+
+    Only leading assets are shared, so common bundles, loaded before the
+    bundle, don't change the order of the assets (which matters for both CSS
+    and JavaScript) and a bundle never loads assets it doesn't contain. The
+    shared leading assets of the bundles form a tree, which is split into
+    segments: consecutive assets shared by the same bundles.
+
+    Returns:
+        a list of `(assets, bundles)` tuples, each segment being shared by
+        at least `min_bundles` bundles. The segments of a bundle are in the
+        same order as its assets.
+    """
+    segments = []
+    # bundles sharing their first `depth` assets, and their current segment
+    groups = [(bundles, 0, None)]
+    while groups:
+        group, depth, segment = groups.pop(0)
+
+        # split the group by the asset at position `depth`
+        identities = []
+        children = {}
+        for bundle in group:
+            if depth < len(bundle.assets):
+                identity = bundle.assets[depth].get_identity()
+                if identity not in children:
+                    identities.append(identity)
+                    children[identity] = []
+                children[identity].append(bundle)
+
+        for identity in identities:
+            child = children[identity]
+            if len(child) < min_bundles:
+                continue
+            asset = child[0].assets[depth]
+            if segment is not None and len(child) == len(group):
+                # same bundles, the segment goes on
+                segment[0].append(asset)
+                groups.append((child, depth + 1, segment))
+            else:
+                new_segment = ([asset], child)
+                segments.append(new_segment)
+                groups.append((child, depth + 1, new_segment))
+
+    return segments
+
+
+def extract_common_assets(bundles, min_bundles=2, prefix='common',
+                          reserved_names=()):
+    """ Move the leading assets shared by at least `min_bundles` bundles of
+    the same kind (see :func:`get_bundle_kind`) into common bundles (see
+    :func:`get_shared_segments`).
+
+    Args:
+        bundles: a list of :class:`flask_compressor.Bundle` objects
+        min_bundles: the minimum number of bundles sharing an asset
+        prefix: the prefix of the names of the common bundles, followed by
+            the extension of the bundles (`common_js`, `common_js_2`, ...)
+        reserved_names: names which can't be used for common bundles
+
+    Returns:
+        a tuple with the common bundles, the modified bundles (copies of the
+        bundles without the shared assets) and a dict with the names of the
+        modified bundles as keys and the names of their common bundles, in
+        order, as values
+    """
+    kinds = {}
+    for bundle in sorted(bundles, key=lambda bundle: bundle.name):
+        kinds.setdefault(get_bundle_kind(bundle), []).append(bundle)
+
+    names = set(reserved_names)
+    common_bundles = []
+    common_names = {}
+
+    for kind_bundles in sorted(kinds.values(), key=lambda b: b[0].name):
+        for assets, segment_bundles in get_shared_segments(kind_bundles,
+                                                           min_bundles):
+            template = segment_bundles[0]
+            name = '{}_{}'.format(prefix, template.extension)
+            suffix = 1
+            while name in names:
+                suffix += 1
+                name = '{}_{}_{}'.format(prefix, template.extension, suffix)
+            names.add(name)
+            common_bundles.append(copy_bundle(template, name, assets))
+
+            for bundle in segment_bundles:
+                common_names.setdefault(bundle.name, []).append(name)
+
+    modified_bundles = []
+    for bundle in bundles:
+        if bundle.name in common_names:
+            length = sum(len(common.assets) for common in common_bundles
+                         if common.name in common_names[bundle.name])
+            modified_bundles.append(copy_bundle(bundle, bundle.name,
+                                                bundle.assets[length:]))
+
+    return common_bundles, modified_bundles, common_names
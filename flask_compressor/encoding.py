@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Content encodings (gzip, brotli) for the Flask-Compressor extension.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import io
+import gzip
+from .exceptions import CompressorException
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def gzip_encode(data):
+    """ Compress `data` (bytes) with gzip at the maximum level.
+
+    The modification time in the gzip header is set to 0, so the same data
+    always gives the same compressed bytes.
+    """
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9,
+                       mtime=0) as handle:
+        handle.write(data)
+    return buf.getvalue()
+
+
+def brotli_encode(data):
+    """ Compress `data` (bytes) with brotli at the maximum quality. """
+    return brotli.compress(data, quality=11)
+
+
+#: supported encodings, indexed by their name in the `Content-Encoding`
+#: header. `identity` returns the data unchanged.
+ENCODERS = {
+    'identity': lambda data: data,
+    'gzip': gzip_encode,
+    'br': brotli_encode,
+}
+
+
+#: suffix of the files containing a content compressed with an encoding
+FILE_SUFFIXES = {
+    'identity': '',
+    'gzip': '.gz',
+    'br': '.br',
+}
+
+
+def get_available_encodings(encodings):
+    """ Return the encodings from `encodings` which can be used, in the same
+    order. The `br` encoding is available only if the `brotli` package is
+    installed. """
+    return [
+        encoding for encoding in encodings
+        if encoding in ENCODERS and (encoding != 'br' or brotli is not None)
+    ]
+
+
+def encode(data, encoding):
+    """ Compress `data` (bytes) with `encoding`.
+
+    Args:
+        data: the bytes to compress
+        encoding: the name of the encoding (`identity`, `gzip` or `br`)
+
+    Returns:
+        the compressed bytes
+
+    Raises:
+        CompressorException: if the encoding is not available
+    """
+    if encoding not in get_available_encodings([encoding]):
+        raise CompressorException("Encoding '{}' is not available."
+                                  "".format(encoding))
+    return ENCODERS[encoding](data)
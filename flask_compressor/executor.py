@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Executors used by the Flask-Compressor extension to process assets.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import threading
+from flask import Flask, current_app
+from .exceptions import CompressorException
+
+
+# minimal Flask applications used to call processors in worker processes,
+# indexed by the debug flag
+_worker_apps = {}
+
+
+def _call_processor(processor, content, debug):
+    """ Call `processor` in a worker process.
+
+    Processors usually check `current_app.debug`, so they are called in the
+    context of a minimal Flask application with the same debug flag as the
+    application using the extension.
+    """
+    if debug not in _worker_apps:
+        app = Flask(__name__)
+        app.debug = debug
+        _worker_apps[debug] = app
+
+    with _worker_apps[debug].app_context():
+        return processor(content)
+
+
+class SerialExecutor(object):
+    """ An executor running everything in the current thread. Used when no
+    executor is configured. """
+
+    def map(self, func, items):
+        """ Call `func` for each item in `items`.
+
+        Returns:
+            a list with the return values, in the same order as `items`
+        """
+        return [func(item) for item in items]
+
+    def run_processor(self, processor, content):
+        """ Call `processor` with `content` and return the processed
+        content. """
+        return processor(content)
+
+    def shutdown(self):
+        """ Release resources used by the executor. """
+        pass
+
+
+class PoolExecutor(SerialExecutor):
+    """ An executor processing assets in parallel.
+
+    Items given to :meth:`map` (usually assets) are handled by a pool of
+    threads, each thread running in the context of the current Flask
+    application. This is enough for processors spending their time waiting
+    for a subprocess (like `lesscss`).
+
+    With `kind='process'`, processors are also called in a pool of processes
+    (see :meth:`run_processor`), which is better for CPU-bound processors
+    (like `cssmin` or `jsmin`). Processors must then be picklable (defined at
+    the top level of a module), and are called in the context of a minimal
+    Flask application: only `current_app.debug` is meaningful.
+    """
+
+    def __init__(self, kind='thread', max_workers=None):
+        """ Initializes a :class:`PoolExecutor` instance.
+
+        Args:
+            kind: `thread` or `process` (default: `thread`)
+            max_workers: the maximum number of threads (and processes), or
+                `None` to use the default of :mod:`concurrent.futures`
+
+        Raises:
+            CompressorException: if `kind` is not supported
+        """
+        # not available on Python 2 without the `futures` package, only
+        # import it when an executor is configured
+        from concurrent.futures import ThreadPoolExecutor, \
+            ProcessPoolExecutor
+
+        if kind not in ('thread', 'process'):
+            raise CompressorException("Unknown executor '{}', use 'thread' "
+                                      "or 'process'.".format(kind))
+
+        self.kind = kind
+        self.thread_pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.process_pool = None
+        if kind == 'process':
+            self.process_pool = ProcessPoolExecutor(max_workers=max_workers)
+
+        # set in threads of the pool
+        self._local = threading.local()
+
+    def map(self, func, items):
+        """ Call `func` for each item in `items`, in the pool of threads.
+
+        If called from a thread of the pool, items are handled in the
+        current thread, so a thread never waits for another thread of the
+        pool.
+
+        Returns:
+            a list with the return values, in the same order as `items`
+        """
+        items = list(items)
+        if len(items) < 2 or getattr(self._local, 'in_pool', False):
+            return super(PoolExecutor, self).map(func, items)
+
+        app = current_app._get_current_object()
+
+        def call(item):
+            self._local.in_pool = True
+            with app.app_context():
+                return func(item)
+
+        return list(self.thread_pool.map(call, items))
+
+    def run_processor(self, processor, content):
+        """ Call `processor` with `content` and return the processed content.
+
+        With `kind='process'`, the processor is called in the pool of
+        processes.
+        """
+        if self.process_pool is None:
+            return processor(content)
+
+        future = self.process_pool.submit(_call_processor, processor,
+                                          content, current_app.debug)
+        return future.result()
+
+    def shutdown(self):
+        """ Wait for pending calls and stop the pools. """
+        self.thread_pool.shutdown()
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Content fingerprints (hashes used in URLs) for the Flask-Compressor
+    extension.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import hashlib
+from .exceptions import CompressorException
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def _new_xxhash():
+    """ Return a new 128 bits xxHash object (64 bits with old versions of
+    the `xxhash` package). """
+    if hasattr(xxhash, 'xxh3_128'):
+        return xxhash.xxh3_128()
+    return xxhash.xxh64()
+
+
+def get_hash_factory(algorithm):
+    """ Return a function creating hash objects for `algorithm`.
+
+    Available algorithms are the ones from :mod:`hashlib` (like `md5` or
+    `blake2b`) and `xxhash` if the `xxhash` package is installed. `blake2b`
+    uses a digest of 16 bytes.
+
+    Raises:
+        CompressorException: if the algorithm is not available
+    """
+    if algorithm == 'xxhash':
+        if xxhash is None:
+            raise CompressorException("'xxhash' is not installed. Please "
+                                      "install it if you want to use the "
+                                      "'xxhash' algorithm.")
+        return _new_xxhash
+
+    if algorithm == 'blake2b' and hasattr(hashlib, 'blake2b'):
+        return lambda: hashlib.blake2b(digest_size=16)
+
+    try:
+        hashlib.new(algorithm)
+    except ValueError:
+        raise CompressorException("Unknown hash algorithm '{}'."
+                                  "".format(algorithm))
+    return lambda: hashlib.new(algorithm)
+
+
+def fingerprint(chunks, algorithm='md5', length=None):
+    """ Compute the fingerprint of the concatenation of `chunks`, without
+    building the concatenation.
+
+    Args:
+        chunks: an iterable of strings
+        algorithm: the hash algorithm (default: `md5`)
+        length: truncate the hexadecimal digest to `length` characters, or
+            `None` to keep the full digest (default: `None`)
+
+    Returns:
+        the hexadecimal digest
+    """
+    digest = get_hash_factory(algorithm)()
+    for chunk in chunks:
+        digest.update(chunk.encode('utf-8'))
+    return digest.hexdigest()[:length]
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+
+"""
+    A pool of long-lived LESS compilers for the `lesscss` processor.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import os
+import json
+import select
+import threading
+import subprocess
+from .exceptions import CompressorProcessorException
+from .metrics import timer
+
+try:
+    import queue
+except ImportError:
+    # Python 2
+    import Queue as queue
+
+
+#: the command used by default to start a worker, `lessc_worker.js` requires
+#: the `less` node module
+DEFAULT_WORKER_COMMAND = [
+    'node', os.path.join(os.path.dirname(__file__), 'lessc_worker.js')
+]
+
+
+#: maximum duration of a compilation by a worker, in seconds
+DEFAULT_TIMEOUT = 30
+
+#: maximum duration of a health check, in seconds
+DEFAULT_PING_TIMEOUT = 5
+
+
+class LesscWorkerTimeout(IOError):
+    """ Raised when a worker doesn't answer in time. """
+
+
+class LesscWorker(object):
+    """
+        A LESS compiler running in a subprocess, and compiling several
+        contents without being restarted.
+
+        Requests and responses are JSON objects, one per line, written on the
+        standard input and read on the standard output of the subprocess (see
+        `lessc_worker.js` for a description of the protocol).
+    """
+
+    def __init__(self, command):
+        """ Initializes a :class:`LesscWorker` instance. The subprocess is
+        started by :meth:`start`.
+
+        Args:
+            command: the command line of the subprocess (a list)
+        """
+        self.command = command
+        self.process = None
+        # bytes read from the subprocess, not yet returned as a response
+        self._buffer = b''
+
+    def is_alive(self):
+        """ Return `True` if the subprocess is running. """
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """ Start the subprocess.
+
+        Raises:
+            CompressorProcessorException: If the command can't be invoked.
+        """
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        except OSError as e:
+            raise CompressorProcessorException("Error when invoking the LESS "
+                                               "worker: " + e.strerror)
+        self._buffer = b''
+
+    def stop(self):
+        """ Stop the subprocess. """
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+        self.process = None
+
+    def restart(self):
+        """ Stop and start again the subprocess. """
+        self.stop()
+        self.start()
+
+    @staticmethod
+    def _wait(fd, write, deadline, timeout):
+        """ Wait until the file descriptor `fd` can be written (if `write`
+        is `True`) or read, until `deadline` (a value of
+        :func:`flask_compressor.metrics.timer`).
+
+        Raises:
+            LesscWorkerTimeout: if the deadline is reached.
+        """
+        remaining = deadline - timer()
+        if remaining > 0:
+            if write:
+                ready = select.select([], [fd], [], remaining)[1]
+            else:
+                ready = select.select([fd], [], [], remaining)[0]
+            if ready:
+                return
+        raise LesscWorkerTimeout('the LESS worker did not answer in {}s'
+                                 ''.format(timeout))
+
+    def _write(self, data, deadline, timeout):
+        """ Write `data` (bytes) on the standard input of the subprocess,
+        waiting until `deadline` at most (or forever if `deadline` is `None`).
+
+        A worker which doesn't read its input blocks the writes once the
+        pipe is full: data is written by blocks of at most `PIPE_BUF` bytes,
+        which never block once :func:`select.select` reports the pipe as
+        writable.
+        """
+        fd = self.process.stdin.fileno()
+        if deadline is None:
+            block_size = len(data)
+        else:
+            block_size = select.PIPE_BUF
+        while data:
+            if deadline is not None:
+                self._wait(fd, True, deadline, timeout)
+            written = os.write(fd, data[:block_size])
+            data = data[written:]
+
+    def _readline(self, deadline, timeout):
+        """ Read a line from the standard output of the subprocess, waiting
+        until `deadline` at most (or forever if `deadline` is `None`).
+
+        The file descriptor is read directly, so :func:`select.select` never
+        misses data kept in the buffer of a file object.
+        """
+        fd = self.process.stdout.fileno()
+        while b'\n' not in self._buffer:
+            if deadline is not None:
+                self._wait(fd, False, deadline, timeout)
+            chunk = os.read(fd, 64 * 1024)
+            if not chunk:
+                raise IOError('the LESS worker has stopped')
+            self._buffer += chunk
+
+        line, _, self._buffer = self._buffer.partition(b'\n')
+        return line
+
+    def request(self, message, timeout=None):
+        """ Send a request to the subprocess, and return the response.
+
+        Args:
+            message: a dict, sent as a JSON object
+            timeout: the maximum duration of the request (sending the
+                message and reading the response), in seconds, or `None` to
+                wait forever (default: `None`)
+
+        Returns:
+            the response (a dict)
+
+        Raises:
+            LesscWorkerTimeout: if the subprocess doesn't read the message
+                or doesn't answer in time, the subprocess must be restarted.
+            IOError: if the subprocess has stopped.
+            ValueError: if the response is not valid JSON.
+        """
+        deadline = None if timeout is None else timer() + timeout
+        if os.name == 'nt':
+            # `select()` doesn't support pipes on Windows
+            deadline = None
+
+        self._write(json.dumps(message).encode('utf-8') + b'\n', deadline,
+                    timeout)
+        line = self._readline(deadline, timeout)
+        return json.loads(line.decode('utf-8'))
+
+    def ping(self, timeout=DEFAULT_PING_TIMEOUT):
+        """ Return `True` if the subprocess answers to a health check in
+        less than `timeout` seconds. """
+        if not self.is_alive():
+            return False
+        try:
+            response = self.request({'ping': True}, timeout=timeout)
+        except (IOError, OSError, ValueError):
+            return False
+        return response.get('pong') is True
+
+
+class LesscWorkerPool(object):
+    """
+        A pool of :class:`LesscWorker` objects. Each worker is used by one
+        thread at a time. Workers are started when they are first used, and
+        restarted if they stop or don't answer in time.
+    """
+
+    def __init__(self, command=None, size=2, timeout=DEFAULT_TIMEOUT,
+                 health_check_interval=None):
+        """ Initializes a :class:`LesscWorkerPool` instance.
+
+        Args:
+            command: the command line of the workers (default:
+                `DEFAULT_WORKER_COMMAND`)
+            size: the number of workers (default: 2)
+            timeout: the maximum duration of a compilation, in seconds, or
+                `None` to wait forever (default: 30)
+            health_check_interval: if not `None`, :meth:`check_health` is
+                called every `health_check_interval` seconds by a background
+                thread (default: `None`)
+        """
+        self.command = command or DEFAULT_WORKER_COMMAND
+        self.size = size
+        self.timeout = timeout
+        self._workers = queue.Queue()
+        for _ in range(size):
+            self._workers.put(LesscWorker(self.command))
+
+        self._closed = threading.Event()
+        self._health_checks = None
+        if health_check_interval is not None:
+            self._health_checks = threading.Thread(
+                target=self._run_health_checks,
+                args=(health_check_interval,),
+                name='flask-compressor-lessc-health-checks',
+            )
+            self._health_checks.daemon = True
+            self._health_checks.start()
+
+    def compile(self, content):
+        """ Compile LESS code to regular CSS content.
+
+        If the worker stops while compiling, it's restarted and the content
+        is sent again, once. If the worker doesn't read the content or
+        doesn't answer in `timeout` seconds, it's killed (and restarted by
+        the next compilation), and the content is not sent again.
+
+        Args:
+            content: the LESS code
+
+        Returns:
+            the CSS content
+
+        Raises:
+            CompressorProcessorException: If the content can't be compiled.
+        """
+        worker = self._workers.get()
+        try:
+            for attempt in range(2):
+                if not worker.is_alive():
+                    worker.restart()
+                try:
+                    response = worker.request({'source': content},
+                                              timeout=self.timeout)
+                    break
+                except (IOError, OSError, ValueError) as e:
+                    worker.stop()
+                    if attempt == 1 or isinstance(e, LesscWorkerTimeout):
+                        raise CompressorProcessorException(
+                            "Error with the LESS worker: {}".format(e)
+                        )
+        finally:
+            self._workers.put(worker)
+
+        if 'error' in response:
+            raise CompressorProcessorException("Error with 'lesscss': " +
+                                               response['error'])
+        return response['css']
+
+    def check_health(self, timeout=DEFAULT_PING_TIMEOUT):
+        """ Send a health check to each idle worker, and restart the workers
+        which don't answer in `timeout` seconds. Busy workers are not
+        checked, they are killed if a compilation takes too long.
+
+        Returns:
+            the number of workers restarted
+        """
+        restarted = 0
+        for _ in range(self.size):
+            try:
+                worker = self._workers.get_nowait()
+            except queue.Empty:
+                # all other workers are busy
+                break
+            try:
+                if not worker.ping(timeout):
+                    worker.restart()
+                    restarted += 1
+            finally:
+                self._workers.put(worker)
+        return restarted
+
+    def _run_health_checks(self, interval):
+        """ Call :meth:`check_health` every `interval` seconds, until the
+        pool is closed. """
+        while not self._closed.wait(interval):
+            try:
+                self.check_health()
+            except CompressorProcessorException:
+                # the worker can't be started, try again later
+                pass
+
+    def close(self):
+        """ Stop all workers. """
+        self._closed.set()
+        for _ in range(self.size):
+            worker = self._workers.get()
+            worker.stop()
+            self._workers.put(worker)
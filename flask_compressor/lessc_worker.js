@@ -0,0 +1,37 @@
+/*
+ * A long-lived LESS compiler used by the `lesscss` processor of
+ * Flask-Compressor (see flask_compressor/lessc.py).
+ *
+ * Each line read on stdin is a JSON request, and a JSON response is written
+ * on stdout for each request, on a single line:
+ *
+ *   {"source": "<LESS code>"}  ->  {"css": "<CSS code>"} or {"error": "..."}
+ *   {"ping": true}             ->  {"pong": true}
+ */
+
+var less = require('less');
+var readline = require('readline');
+
+function reply(response) {
+    process.stdout.write(JSON.stringify(response) + '\n');
+}
+
+readline.createInterface({input: process.stdin}).on('line', function (line) {
+    var request;
+    try {
+        request = JSON.parse(line);
+    } catch (e) {
+        reply({error: 'invalid request: ' + e.message});
+        return;
+    }
+
+    if (request.ping) {
+        reply({pong: true});
+        return;
+    }
+
+    less.render(request.source, {}).then(
+        function (output) { reply({css: output.css}); },
+        function (error) { reply({error: error.message}); }
+    );
+});
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Build processed bundles ahead of time, and load them from a manifest.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import os
+import json
+import errno
+import tempfile
+from .exceptions import CompressorException
+from .encoding import FILE_SUFFIXES
+
+
+#: name of the manifest file written in the output directory of a build
+MANIFEST_FILENAME = 'manifest.json'
+
+#: version of the manifest format
+MANIFEST_VERSION = 1
+
+
+class Manifest(object):
+    """
+        A manifest describes the result of a build: for each bundle (and each
+        chunk and asset of the bundle), the hash, the URL, the size, the
+        mimetype and the file containing the processed content, and the
+        files containing the content compressed with each encoding (in
+        `encodings`, indexed by the name of the encoding).
+
+        Filenames in the manifest are relative to the directory containing
+        the manifest file.
+    """
+
+    def __init__(self, bundles=None, root=None):
+        """ Initializes a :class:`Manifest` instance.
+
+        Args:
+            bundles: a dict with bundle names as keys and bundle entries as
+                values (default: `{}`)
+            root: the directory used to resolve filenames in the entries
+        """
+        self.bundles = bundles or {}
+        self.root = root
+
+    @classmethod
+    def load(cls, filename):
+        """ Load a manifest from a file.
+
+        Args:
+            filename: path to the manifest file
+
+        Returns:
+            A :class:`Manifest` object.
+
+        Raises:
+            CompressorException: If the file can't be read or is not a valid
+                manifest.
+        """
+        try:
+            with open(filename, 'rb') as handle:
+                data = json.loads(handle.read().decode('utf-8'))
+        except (IOError, OSError, ValueError) as e:
+            raise CompressorException("Unable to load the manifest '{}': {}"
+                                      "".format(filename, e))
+
+        if data.get('version') != MANIFEST_VERSION:
+            raise CompressorException("Unsupported manifest version in '{}'."
+                                      "".format(filename))
+
+        root = os.path.dirname(os.path.abspath(filename))
+        return cls(bundles=data['bundles'], root=root)
+
+    def save(self, filename):
+        """ Write the manifest in a file.
+
+        Args:
+            filename: path to the manifest file
+        """
+        data = {'version': MANIFEST_VERSION, 'bundles': self.bundles}
+        with open(filename, 'wb') as handle:
+            handle.write(json.dumps(data, indent=2, sort_keys=True)
+                         .encode('utf-8'))
+
+    def get_bundle(self, name):
+        """ Return the entry of the bundle identified by `name`, or `None` if
+        the bundle is not in the manifest. """
+        return self.bundles.get(name)
+
+    def get_asset(self, bundle_name, index):
+        """ Return the entry of the asset at position `index` in the bundle
+        identified by `bundle_name`, or `None` if the asset is not in the
+        manifest. """
+        entry = self.get_bundle(bundle_name)
+        if entry is None or index >= len(entry['assets']):
+            return None
+        return entry['assets'][index]
+
+    def get_chunk(self, bundle_name, index):
+        """ Return the entry of the chunk at position `index` in the bundle
+        identified by `bundle_name`, or `None` if the chunk is not in the
+        manifest. """
+        entry = self.get_bundle(bundle_name)
+        if entry is None or index >= len(entry.get('chunks', [])):
+            return None
+        return entry['chunks'][index]
+
+    def get_encoded(self, entry, encoding):
+        """ Return the entry of the content of `entry` compressed with
+        `encoding`, or `None` if the build doesn't contain this encoding. """
+        return entry.get('encodings', {}).get(encoding)
+
+    def get_path(self, entry):
+        """ Return the absolute path of the file referenced by `entry`. """
+        return os.path.join(self.root, *entry['filename'].split('/'))
+
+    def read(self, entry):
+        """ Return the processed content of the file referenced by
+        `entry`. """
+        with open(self.get_path(entry), 'rb') as handle:
+            return handle.read().decode('utf-8')
+
+
+def write_file(output_dir, filename, data):
+    """ Write `data` (bytes) in `output_dir/filename`, and return the number
+    of written bytes.
+
+    The data is written in a temporary file which is then renamed, so
+    concurrent readers never see a partially written file. The file is
+    readable by everyone, since it may be served by a front server.
+    """
+    path = os.path.join(output_dir, *filename.split('/'))
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.chmod(tmp_filename, 0o644)
+        os.rename(tmp_filename, path)
+    except (IOError, OSError):
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+    return len(data)
+
+
+def build_entry(obj, mimetype, output_dir, encodings):
+    """ Write the content of a bundle, a chunk or an asset (`obj`) in
+    `output_dir`, with a file for each encoding of `encodings`, and return
+    its entry in the manifest. """
+    filename = obj.output_filename
+    entry = {
+        'hash': obj.hash,
+        'url': obj.url,
+        'mimetype': mimetype,
+        'filename': filename,
+        'size': write_file(output_dir, filename,
+                           obj.encode_content('identity')),
+        'encodings': {},
+    }
+
+    # compressed ahead of time, so workers serving the build never compress
+    # the content
+    for encoding in encodings:
+        encoded_filename = filename + FILE_SUFFIXES[encoding]
+        entry['encodings'][encoding] = {
+            'filename': encoded_filename,
+            'size': write_file(output_dir, encoded_filename,
+                               obj.encode_content(encoding)),
+        }
+    return entry
+
+
+def build(bundles, output_dir, encodings=()):
+    """ Process bundles and write the results in `output_dir`.
+
+    Must be called in a request context, since URLs are built with
+    :func:`flask.url_for`. A file is written for the content of each bundle,
+    of each chunk of a split bundle and of each asset, using the same path as
+    the URL served by the blueprint, and a file for the content compressed
+    with each encoding (with a `.gz` or `.br` suffix). The manifest
+    describing the build is written in `output_dir/manifest.json`.
+
+    Args:
+        bundles: a list of :class:`flask_compressor.Bundle` objects
+        output_dir: the directory where files are written
+        encodings: the names of the encodings (`gzip`, `br`) of the
+            compressed files (default: no compressed files)
+
+    Returns:
+        A :class:`Manifest` object.
+    """
+    entries = {}
+
+    for bundle in bundles:
+        entry = build_entry(bundle, bundle.mimetype, output_dir, encodings)
+        entry['assets'] = [
+            build_entry(asset, bundle.mimetype, output_dir, encodings)
+            for asset in bundle.assets
+        ]
+
+        chunks = bundle.chunks
+        if chunks:
+            entry['chunks'] = []
+        for chunk in chunks:
+            chunk_entry = build_entry(chunk, bundle.mimetype, output_dir,
+                                      encodings)
+            chunk_entry['assets'] = chunk.asset_indexes
+            entry['chunks'].append(chunk_entry)
+
+        entries[bundle.name] = entry
+
+    manifest = Manifest(bundles=entries, root=os.path.abspath(output_dir))
+    manifest.save(os.path.join(output_dir, MANIFEST_FILENAME))
+    return manifest
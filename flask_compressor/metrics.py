@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Metrics collected by the Flask-Compressor extension.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import time
+import threading
+from .signals import processor_called, content_served
+
+
+#: function used to measure durations
+timer = getattr(time, 'perf_counter', time.time)
+
+#: buckets of the histogram of processor durations, in seconds
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+#: buckets of the histogram of response sizes, in bytes
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+
+
+class Histogram(object):
+    """ A histogram with cumulative buckets, like Prometheus histograms. """
+
+    def __init__(self, buckets):
+        """ Initializes a :class:`Histogram` instance.
+
+        Args:
+            buckets: the upper bounds of the buckets, in increasing order
+        """
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        """ Add a value in the histogram. """
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        """ Return the buckets (with the `+Inf` bucket), the count and the
+        sum of the histogram. """
+        buckets = [
+            ['{}'.format(bound), count]
+            for bound, count in zip(self.buckets, self.counts)
+        ]
+        buckets.append(['+Inf', self.count])
+        return {'buckets': buckets, 'count': self.count, 'sum': self.sum}
+
+
+class Metrics(object):
+    """
+        Collect metrics from the signals sent by an application: duration of
+        each processor, and sizes of the responses sent by the blueprint.
+        Statistics from the caches are added by :meth:`get_stats`.
+    """
+
+    def __init__(self):
+        # processor name -> Histogram
+        self.processor_durations = {}
+        # (kind, encoding) -> Histogram
+        self.response_sizes = {}
+        # (kind, status code) -> number of responses
+        self.responses = {}
+        self._lock = threading.Lock()
+
+    def connect(self, app):
+        """ Collect metrics from the signals sent by `app`. """
+        processor_called.connect(self.on_processor_called, sender=app)
+        content_served.connect(self.on_content_served, sender=app)
+
+    def on_processor_called(self, sender, name, duration):
+        """ Receiver for the `processor_called` signal. """
+        with self._lock:
+            if name not in self.processor_durations:
+                self.processor_durations[name] = Histogram(DURATION_BUCKETS)
+            self.processor_durations[name].observe(duration)
+
+    def on_content_served(self, sender, kind, name, response):
+        """ Receiver for the `content_served` signal. """
+        encoding = response.headers.get('Content-Encoding', 'identity')
+        with self._lock:
+            key = (kind, response.status_code)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+            if response.status_code == 200:
+                key = (kind, encoding)
+                if key not in self.response_sizes:
+                    self.response_sizes[key] = Histogram(SIZE_BUCKETS)
+                self.response_sizes[key].observe(response.content_length or 0)
+
+    def get_stats(self, caches):
+        """ Return all metrics, as a dict of metric families. Each family has
+        a `type` (`counter`, `gauge` or `histogram`), a `help` text, and a
+        list of `samples`, each sample has `labels`.
+
+        Args:
+            caches: a dict of cache names and objects with a `get_stats()`
+                method, like :class:`flask_compressor.cache.LRUCache`
+        """
+        def family(metric_type, help_text, samples):
+            return {'type': metric_type, 'help': help_text,
+                    'samples': samples}
+
+        with self._lock:
+            durations = [
+                dict(labels={'processor': name}, **histogram.to_dict())
+                for name, histogram in sorted(
+                    self.processor_durations.items()
+                )
+            ]
+            sizes = [
+                dict(labels={'kind': kind, 'encoding': encoding},
+                     **histogram.to_dict())
+                for (kind, encoding), histogram in sorted(
+                    self.response_sizes.items()
+                )
+            ]
+            responses = [
+                {'labels': {'kind': kind, 'status': '{}'.format(status)},
+                 'value': count}
+                for (kind, status), count in sorted(self.responses.items())
+            ]
+
+        cache_stats = [
+            (name, cache.get_stats()) for name, cache in sorted(caches.items())
+        ]
+
+        def cache_samples(stat):
+            return [
+                {'labels': {'cache': name}, 'value': stats[stat]}
+                for name, stats in cache_stats if stat in stats
+            ]
+
+        return {
+            'compressor_processor_duration_seconds': family(
+                'histogram', 'Duration of processor calls.', durations
+            ),
+            'compressor_response_size_bytes': family(
+                'histogram', 'Size of responses sent by the blueprint.', sizes
+            ),
+            'compressor_responses_total': family(
+                'counter', 'Responses sent by the blueprint.', responses
+            ),
+            'compressor_cache_hits_total': family(
+                'counter', 'Cache hits.', cache_samples('hits')
+            ),
+            'compressor_cache_misses_total': family(
+                'counter', 'Cache misses.', cache_samples('misses')
+            ),
+            'compressor_cache_evictions_total': family(
+                'counter', 'Cache evictions.', cache_samples('evictions')
+            ),
+            'compressor_cache_entries': family(
+                'gauge', 'Entries in the cache.', cache_samples('entries')
+            ),
+        }
+
+
+def format_labels(labels, **extra):
+    """ Format labels for the Prometheus text format. """
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, labels[key].replace('\\', '\\\\')
+                         .replace('"', '\\"'))
+        for key in sorted(labels)
+    ) + '}'
+
+
+def to_prometheus(stats):
+    """ Format metrics returned by :meth:`Metrics.get_stats` with the
+    Prometheus text format. """
+    lines = []
+    for name in sorted(stats):
+        family = stats[name]
+        lines.append('# HELP {} {}'.format(name, family['help']))
+        lines.append('# TYPE {} {}'.format(name, family['type']))
+        for sample in family['samples']:
+            labels = sample['labels']
+            if family['type'] != 'histogram':
+                lines.append('{}{} {}'.format(name, format_labels(labels),
+                                              sample['value']))
+                continue
+            for bound, count in sample['buckets']:
+                lines.append('{}_bucket{} {}'.format(
+                    name, format_labels(labels, le=bound), count
+                ))
+            lines.append('{}_sum{} {}'.format(name, format_labels(labels),
+                                              sample['sum']))
+            lines.append('{}_count{} {}'.format(name, format_labels(labels),
+                                                sample['count']))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Built-in CSS and JavaScript minifiers for the Flask-Compressor extension.
+
+    Both minifiers read the content once with a precompiled tokenizer: strings,
+    comments and whitespace are recognized by a single regular expression,
+    everything else is copied by chunks. Only comments and whitespace are
+    removed, values are never rewritten, so the output is equivalent to the
+    output of `cssmin` and `jsmin` while being a bit larger.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import re
+
+
+#: version of the minifiers, changed each time their output changes (used to
+#: invalidate cached results)
+VERSION = '2'
+
+
+_CSS_TOKENS = re.compile(r'''
+      ( "(?:[^"\\\n]|\\.)*" | '(?:[^'\\\n]|\\.)*' )  # 1: string
+    | ( /\*!.*?\*/ )                                # 2: preserved comment
+    | ( /\*.*?(?:\*/|\Z) )                          # 3: comment
+    | ( \s+ )                                       # 4: whitespace
+    | ( ; )                                         # 5: semicolon
+    | url\(\s*( (?:[^()"'\\\s]|\\.)* )\s*\)         # 6: unquoted URL
+    | ( (?:[^"'/\s;u]|u(?!rl\())+ | . )             # 7: anything else
+''', re.VERBOSE | re.DOTALL | re.IGNORECASE)
+
+# whitespace is never needed after or before these characters
+_CSS_NO_SPACE_AFTER = frozenset('{};,>(:')
+_CSS_NO_SPACE_BEFORE = frozenset('{};,>)!')
+
+# combinators, whitespace around them is removed outside of parentheses
+# (`calc(1px + 2px)` requires the whitespace)
+_CSS_COMBINATORS = frozenset('+~')
+
+
+def minify_css(css):
+    """ Remove comments and unnecessary whitespace and semicolons from CSS
+    code.
+
+    Comments starting with `/*!` (usually licenses) are kept.
+
+    Args:
+        css: the CSS code
+
+    Returns:
+        the minified CSS code
+    """
+    out = []
+    last = ''
+    space = semicolon = False
+    depth = 0
+
+    for match in _CSS_TOKENS.finditer(css):
+        string, preserved, comment, whitespace, semi, url, other = \
+            match.groups()
+
+        if comment is not None:
+            continue
+        if whitespace is not None:
+            space = True
+            continue
+        if semi is not None:
+            semicolon = True
+            continue
+
+        if url is not None:
+            token = 'url(' + url + ')'
+        else:
+            token = string or preserved or other
+        first = token[0]
+
+        if semicolon:
+            semicolon = False
+            # `;}` -> `}`
+            if first != '}':
+                out.append(';')
+                last = ';'
+                space = False
+
+        if space:
+            space = False
+            if (out and last not in _CSS_NO_SPACE_AFTER and
+                    first not in _CSS_NO_SPACE_BEFORE and
+                    not (depth == 0 and (last in _CSS_COMBINATORS or
+                                         first in _CSS_COMBINATORS))):
+                out.append(' ')
+
+        out.append(token)
+        last = token[-1]
+        if other is not None:
+            depth += other.count('(') - other.count(')')
+
+    if semicolon:
+        out.append(';')
+
+    return ''.join(out)
+
+
+_JS_TOKENS = re.compile(r'''
+      ( '(?:[^'\\\n]|\\.)*' | "(?:[^"\\\n]|\\.)*"
+      | `(?:[^`\\]|\\.)*` )                         # 1: string, template
+    | ( /\*!.*?\*/ )                                # 2: preserved comment
+    | ( /\*.*?(?:\*/|\Z) | //[^\n]* )               # 3: comment
+    | ( [^\S\n]*\n\s* )                             # 4: whitespace with a
+                                                    #    newline
+    | ( [^\S\n]+ )                                  # 5: whitespace
+    | ( [^'"`/\s]+ | . )                            # 6: anything else
+''', re.VERBOSE | re.DOTALL)
+
+_JS_REGEX = re.compile(r'''
+    /(?![*/])(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*
+''', re.VERBOSE)
+
+# a `/` after these characters starts a regular expression, not a division
+_JS_REGEX_AFTER = frozenset('(,=:[!&|?{};+-*%<>~^')
+
+# except after these operators: a `/` after a postfix increment or decrement
+# is a division (a prefix one can't be followed by a regular expression)
+_JS_DIVISION_AFTER = ('++', '--')
+
+# a `/` after these keywords starts a regular expression
+_JS_REGEX_KEYWORD = re.compile(
+    r'(?:^|[^\w$])(?:return|typeof|case|do|else|in|instanceof|new|delete|'
+    r'void|throw|yield|await)$'
+)
+
+# a newline is kept between these characters (and identifier characters),
+# since it may end a statement
+_JS_NEWLINE_AFTER = frozenset('}])+-"\'`')
+_JS_NEWLINE_BEFORE = frozenset('{[(+-!~"\'`')
+
+
+def _is_identifier_char(char):
+    """ Return `True` if `char` can be part of a JavaScript identifier or
+    number. """
+    return char.isalnum() or char in '_$\\' or char > '\x7f'
+
+
+def minify_js(js):
+    """ Remove comments and unnecessary whitespace from JavaScript code,
+    like `jsmin`.
+
+    Newlines which may end a statement are kept. Comments starting with
+    `/*!` (usually licenses) are kept.
+
+    Args:
+        js: the JavaScript code
+
+    Returns:
+        the minified JavaScript code
+    """
+    out = []
+    last = ''
+    # whitespace between the last token and the next one: `None`, `' '` or
+    # `'\n'`
+    space = None
+    after_regex = False
+    # `True` if the last token ends with `++` or `--`
+    after_increment = False
+    pos = 0
+    end = len(js)
+
+    while pos < end:
+        match = _JS_TOKENS.match(js, pos)
+        pos = match.end()
+        string, preserved, comment, newline, whitespace, other = \
+            match.groups()
+
+        if comment is not None:
+            if '\n' in comment:
+                space = '\n'
+            elif space is None:
+                space = ' '
+            continue
+        if newline is not None:
+            space = '\n'
+            continue
+        if whitespace is not None:
+            if space is None:
+                space = ' '
+            continue
+
+        token = string or preserved or other
+        is_regex = False
+        if token == '/' and not after_increment and (
+                not last or last in _JS_REGEX_AFTER or
+                (_is_identifier_char(last) and
+                 _JS_REGEX_KEYWORD.search(out[-1]))):
+            regex = _JS_REGEX.match(js, match.start())
+            if regex is not None:
+                token = regex.group()
+                pos = regex.end()
+                is_regex = True
+        first = token[0]
+
+        if space is not None and out:
+            # a regular expression ends with its flags
+            last_word = _is_identifier_char(last) or after_regex
+            first_word = _is_identifier_char(first)
+            if (space == '\n' and
+                    (last_word or last in _JS_NEWLINE_AFTER) and
+                    (first_word or first in _JS_NEWLINE_BEFORE)):
+                out.append('\n')
+            elif ((last_word and (first_word or is_regex)) or
+                  (last in '+-/' and first == last) or
+                  (first == '.' and last.isdigit())):
+                out.append(' ')
+        space = None
+
+        out.append(token)
+        last = token[-1]
+        after_regex = is_regex
+        after_increment = other is not None and \
+            token.endswith(_JS_DIVISION_AFTER)
+
+    return ''.join(out)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Preload of the bundles linked by a response, with `Link` headers and
+    `103 Early Hints` responses.
+
+    The `compressor()` template helper records the bundles linked during a
+    request, the `Link: <url>; rel=preload; as=...` headers of these bundles
+    are added to the response once the template is rendered.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+from flask import current_app, request, g
+
+
+#: default key of the WSGI environ holding the callable used to send a `103
+#: Early Hints` response, with a list of `(name, value)` headers, before the
+#: final response (see the `COMPRESSOR_EARLY_HINTS_ENVIRON_KEY` configuration
+#: value). WSGI servers don't provide such a callable, it must be added to
+#: the environ by the application, usually with a middleware.
+EARLY_HINTS_ENVIRON_KEY = 'flask_compressor.early_hints'
+
+
+def record_linked_bundle(bundle_name, concatenate):
+    """ Record that the bundle `bundle_name` is linked by the response of
+    the current request (with
+    :meth:`flask_compressor.Bundle.get_linked_content` and the same
+    `concatenate` argument). """
+    linked = g.setdefault('_compressor_linked', [])
+    if (bundle_name, concatenate) not in linked:
+        linked.append((bundle_name, concatenate))
+
+
+def get_preload_links():
+    """ Return the values of the `Link` headers preloading the bundles linked
+    during the current request. """
+    compressor = current_app.extensions['compressor']
+    links = []
+    for bundle_name, concatenate in g.get('_compressor_linked', []):
+        bundle = compressor.get_bundle(bundle_name)
+        for link in bundle.get_preload_links(concatenate):
+            if link not in links:
+                links.append(link)
+    return links
+
+
+def send_early_hints():
+    """ Send a `103 Early Hints` response with the `Link` headers of the
+    bundles linked by the last successful response of the requested
+    endpoint, with the callable found in the WSGI environ under the
+    `COMPRESSOR_EARLY_HINTS_ENVIRON_KEY` key (nothing is sent if there is no
+    such callable).
+
+    Registered with :meth:`flask.Flask.before_request` when the
+    `COMPRESSOR_EARLY_HINTS` configuration value is `True`.
+    """
+    key = current_app.config['COMPRESSOR_EARLY_HINTS_ENVIRON_KEY']
+    send = request.environ.get(key)
+    if send is None:
+        return
+
+    compressor = current_app.extensions['compressor']
+    links = compressor.early_hints.get(request.endpoint)
+    if links:
+        send([('Link', link) for link in links])
+
+
+def add_preload_headers(response):
+    """ Add the `Link` headers of the bundles linked during the current
+    request to `response`.
+
+    Registered with :meth:`flask.Flask.after_request`.
+    """
+    config = current_app.config
+    if not (config['COMPRESSOR_PRELOAD_HEADERS'] or
+            config['COMPRESSOR_EARLY_HINTS']):
+        return response
+
+    links = get_preload_links()
+
+    if config['COMPRESSOR_EARLY_HINTS'] and 200 <= response.status_code < 300:
+        # the next requests of this endpoint will likely link the same
+        # bundles
+        compressor = current_app.extensions['compressor']
+        compressor.early_hints[request.endpoint] = links
+
+    if config['COMPRESSOR_PRELOAD_HEADERS']:
+        for link in links:
+            response.headers.add('Link', link)
+
+    return response
@@ -6,9 +6,42 @@
 
 from __future__ import unicode_literals, absolute_import, division, \
     print_function
+import functools
+import importlib
 import subprocess
 from flask import current_app
 from .exceptions import CompressorProcessorException
+from .minify import minify_css, minify_js, VERSION as minify_version
+
+
+# third-party minifier modules already imported (`None` if not installed),
+# indexed by their name
+_minifiers = {}
+
+
+def import_minifier(name):
+    """ Return the third-party minifier module `name` (`cssmin` or `jsmin`),
+    or `None` if it's not installed.
+
+    Minifiers are imported on first use, and only once, so processes which
+    never run them (like workers serving a manifest) never import them.
+    """
+    try:
+        return _minifiers[name]
+    except KeyError:
+        pass
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        module = None
+    _minifiers[name] = module
+    return module
+
+
+def get_minifier_version(name):
+    """ Return the version of the third-party minifier module `name`, or
+    `None` if it's not installed. """
+    return getattr(import_minifier(name), '__version__', None)
 
 
 def cssmin(content):
@@ -28,9 +61,8 @@ def cssmin(content):
     Raises:
         CompressorProcessorException: if cssmin is not installed.
     """
-    try:
-        from cssmin import cssmin as cssmin_processor
-    except ImportError:
+    module = import_minifier('cssmin')
+    if module is None:
         raise CompressorProcessorException("'cssmin' is not installed. Please"
                                            " install it if you want to use "
                                            "the 'cssmin' processor.")
@@ -39,7 +71,10 @@ def cssmin(content):
         # do not minify
         return content
 
-    return cssmin_processor(content)
+    return module.cssmin(content)
+
+# cached results are not used anymore after an upgrade of `cssmin`
+cssmin.version = functools.partial(get_minifier_version, 'cssmin')
 
 
 def lesscss(content):
@@ -56,12 +91,20 @@ def lesscss(content):
 
         npm install -g less
 
+    If `COMPRESSOR_LESSC_POOL_SIZE` is set, the content is compiled by a pool
+    of long-lived LESS compilers (see :mod:`flask_compressor.lessc`) instead
+    of starting a new `lessc` command for each content.
+
     Args:
         content: your LESS content
 
     Returns:
         the LESS content compiled to regular CSS content
     """
+    compressor = current_app.extensions.get('compressor')
+    if compressor is not None and compressor.lessc_pool is not None:
+        return compressor.lessc_pool.compile(content)
+
     try:
         process = subprocess.Popen(
             ['lessc', '--no-color', '-'],
@@ -74,12 +117,13 @@ def lesscss(content):
         raise CompressorProcessorException("Error when invoking the 'lessc' "
                                            "command: " + e.strerror)
 
-    stdout, stderr = process.communicate(input=content)
+    stdout, stderr = process.communicate(input=content.encode('utf-8'))
 
     if process.wait() != 0:
-        raise CompressorProcessorException("Error with 'lesscss': " + stderr)
+        raise CompressorProcessorException("Error with 'lesscss': " +
+                                           stderr.decode('utf-8'))
 
-    return stdout
+    return stdout.decode('utf-8')
 
 
 def jsmin(content):
@@ -98,9 +142,8 @@ def jsmin(content):
     Raises:
         CompressorProcessorException: if jsmin is not installed.
     """
-    try:
-        from jsmin import jsmin as jsmin_processor
-    except ImportError:
+    module = import_minifier('jsmin')
+    if module is None:
         raise CompressorProcessorException("'jsmin' is not installed. Please"
                                            " install it if you want to use "
                                            "the 'jsmin' processor.")
@@ -109,8 +152,55 @@ def jsmin(content):
         # do not minify
         return content
 
-    return jsmin_processor(content)
+    return module.jsmin(content)
+
+jsmin.version = functools.partial(get_minifier_version, 'jsmin')
+
+
+def builtin_cssmin(content):
+    """ Minify your CSS assets, without any dependency.
+
+    Use the built-in minifier (see :func:`flask_compressor.minify.minify_css`)
+    which only removes comments and whitespace. It's much faster than
+    `cssmin` on large contents, and the output is equivalent.
+
+    Args:
+        content: your CSS content
+
+    Returns:
+        the minified version of your CSS content, or the original content if
+        the Flask application is in Debug mode
+    """
+    if current_app.debug is True:
+        # do not minify
+        return content
+
+    return minify_css(content)
+
+builtin_cssmin.version = minify_version
+
+
+def builtin_jsmin(content):
+    """ Minify your JavaScript code, without any dependency.
+
+    Use the built-in minifier (see :func:`flask_compressor.minify.minify_js`),
+    which follows the same rules as `jsmin` and is faster.
+
+    Args:
+        content: your JavaScript code
+
+    Returns:
+        the minified version of your JavaScript code, or the original content
+        if the Flask application is in Debug mode
+    """
+    if current_app.debug is True:
+        # do not minify
+        return content
+
+    return minify_js(content)
+
+builtin_jsmin.version = minify_version
 
 
 # processors that should be registered for every app
-DEFAULT_PROCESSORS = [cssmin, lesscss, jsmin]
+DEFAULT_PROCESSORS = [cssmin, lesscss, jsmin, builtin_cssmin, builtin_jsmin]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Signals sent by the Flask-Compressor extension.
+
+    Signals require the `blinker` package, they are silently ignored if it's
+    not installed (see :mod:`flask.signals`).
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+from flask.signals import Namespace
+
+
+_signals = Namespace()
+
+#: Sent each time a processor is called, with the name of the processor
+#: (`name`) and the duration of the call in seconds (`duration`). The sender
+#: is the Flask application.
+processor_called = _signals.signal('processor-called')
+
+#: Sent each time the blueprint serves a bundle or an asset, with the kind of
+#: content (`kind`, `bundle` or `asset`), the name of the bundle (`name`) and
+#: the response (`response`). The sender is the Flask application.
+content_served = _signals.signal('content-served')
+
+#: Sent each time a bundle is warmed by
+#: :meth:`flask_compressor.Compressor.warm`, with the name of the bundle
+#: (`name`), the duration of the warm-up in seconds (`duration`) and an error
+#: message if the bundle can't be processed
+#: (`error`, `None` otherwise). The sender is the Flask application.
+bundle_warmed = _signals.signal('bundle-warmed')
@@ -7,7 +7,8 @@
 from __future__ import unicode_literals, absolute_import, division, \
     print_function
 from jinja2 import Markup
-from flask import current_app
+from flask import current_app, g
+from .preload import record_linked_bundle
 
 
 def compressor(bundle_name, inline=True):
@@ -21,19 +22,60 @@ def compressor(bundle_name, inline=True):
                 output. If `False`, the bundle content is linked to a
                 downloadable ressource. (default: `True`)
 
+        Common bundles extracted from the bundle (see
+        :meth:`flask_compressor.Compressor.extract_common_bundles`) are
+        rendered before it, once per request.
+
         Returns:
             the processed content of the bundle
     """
     compressor_ext = current_app.extensions['compressor']
-    bundle = compressor_ext.get_bundle(bundle_name)
+
+    common_markups = []
+    rendered = g.setdefault('_compressor_common', set())
+    for common_name in compressor_ext.common_bundles.get(bundle_name, ()):
+        if common_name not in rendered:
+            rendered.add(common_name)
+            common_markups.append(compressor(common_name, inline=inline))
+
+    markup = render_bundle(bundle_name, inline)
+    if common_markups:
+        markup = Markup('\n').join(common_markups + [markup])
+    return markup
+
+
+def render_bundle(bundle_name, inline):
+    """ Returns the processed content of a bundle, without its common
+    bundles (see :func:`compressor`). """
+    compressor_ext = current_app.extensions['compressor']
+    debug = current_app.debug
 
     # should assets in the bunble be concatenated into one big asset
-    should_concatenate = not current_app.debug
+    should_concatenate = not debug
+
+    # the output never changes when debug is disabled, until the bundle is
+    # replaced
+    markup = None
+    if not debug:
+        markup = compressor_ext.markup_cache.get((bundle_name, inline))
+
+    if markup is None:
+        bundle = compressor_ext.get_bundle(bundle_name)
+
+        if inline:
+            content = bundle.get_inline_content(concatenate=should_concatenate)
+        else:
+            content = bundle.get_linked_content(concatenate=should_concatenate)
+
+        # mark the string as safe, so HTML tags won't be escaped
+        markup = Markup(content)
+
+        if not debug:
+            compressor_ext.markup_cache[(bundle_name, inline)] = markup
 
-    if inline:
-        content = bundle.get_inline_content(concatenate=should_concatenate)
-    else:
-        content = bundle.get_linked_content(concatenate=should_concatenate)
+    # the linked content is preloaded with `Link` headers (only recorded once
+    # the bundle is found)
+    if not inline:
+        record_linked_bundle(bundle_name, should_concatenate)
 
-    # mark the string as safe, so HTML tags won't be escaped
-    return Markup(content)
+    return markup
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Warm-up of the caches of the Flask-Compressor extension, before the
+    application serves its first request.
+
+"""
+
+from __future__ import unicode_literals, absolute_import, division, \
+    print_function
+import threading
+from flask import current_app
+from .encoding import get_available_encodings
+from .metrics import timer
+from .signals import bundle_warmed
+from .templating import compressor as compressor_template_helper
+
+
+def warm_bundle(bundle):
+    """ Compute everything needed to serve `bundle`: the processed and
+    compressed contents, the hashes and the URLs of the bundle and of its
+    chunks (of its assets in debug mode, since they are linked one by one),
+    and the output of the `compressor()` template helper.
+
+    Must be called in a request context, since URLs are built with
+    :func:`flask.url_for`.
+
+    Returns:
+        the URLs of the warmed bundle and of its chunks (or assets)
+    """
+    encodings = get_available_encodings(
+        current_app.config['COMPRESSOR_ENCODINGS']
+    )
+
+    # assets are only served one by one in debug mode, warming them when
+    # debug is disabled would only fill (and overflow) the memory cache
+    if current_app.debug:
+        objects = [bundle] + list(bundle.assets)
+    else:
+        objects = [bundle] + bundle.chunks
+
+    urls = []
+    for obj in objects:
+        urls.append(obj.url)
+        for encoding in ['identity'] + encodings:
+            obj.get_encoded_content(encoding)
+
+    for inline in (True, False):
+        compressor_template_helper(bundle.name, inline=inline)
+
+    return urls
+
+
+class WarmUp(object):
+    """
+        The progress of a warm-up started by
+        :meth:`flask_compressor.Compressor.warm`.
+
+        Bundles are warmed one after the other. A bundle which can't be
+        processed is skipped, the error is logged and kept in
+        :attr:`errors`.
+    """
+
+    def __init__(self, app, bundles):
+        """ Initializes a :class:`WarmUp` instance. The warm-up is started by
+        :meth:`run` or :meth:`start`.
+
+        Args:
+            app: the Flask application
+            bundles: a list of :class:`flask_compressor.Bundle` objects
+        """
+        self.app = app
+        self.bundles = list(bundles)
+        #: duration of the warm-up of each bundle, in seconds, indexed by
+        #: the name of the bundle
+        self.durations = {}
+        #: error message for each bundle which can't be processed, indexed
+        #: by the name of the bundle
+        self.errors = {}
+        self.duration = None
+        #: number of values evicted from the memory cache during the warm-up
+        self.evictions = 0
+        self.thread = None
+        self._finished = threading.Event()
+
+    @property
+    def total(self):
+        """ The number of bundles to warm. """
+        return len(self.bundles)
+
+    @property
+    def done(self):
+        """ The number of bundles already warmed (or skipped). """
+        return len(self.durations)
+
+    def is_ready(self):
+        """ Return `True` if the warm-up is finished. """
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """ Wait until the warm-up is finished, at most `timeout` seconds.
+
+        Returns:
+            `True` if the warm-up is finished
+        """
+        return self._finished.wait(timeout)
+
+    def run(self):
+        """ Warm all bundles in the current thread. """
+        memory_cache = self.app.extensions['compressor'].memory_cache
+        evictions = memory_cache.evictions
+        start = timer()
+        try:
+            with self.app.test_request_context():
+                for bundle in self.bundles:
+                    self._warm(bundle)
+        finally:
+            self.duration = timer() - start
+            self.evictions = memory_cache.evictions - evictions
+            self._finished.set()
+
+        self.app.logger.info('Flask-Compressor: %d bundles warmed in %.3fs',
+                             self.total, self.duration)
+        if self.evictions:
+            # some warmed values were evicted, they will be computed again
+            self.app.logger.warning(
+                'Flask-Compressor: %d values evicted from the memory cache '
+                'during the warm-up, increase '
+                'COMPRESSOR_MEMORY_CACHE_MAX_ENTRIES (or '
+                'COMPRESSOR_MEMORY_CACHE_MAX_SIZE) to keep all warmed values',
+                self.evictions
+            )
+
+    def start(self):
+        """ Warm all bundles in a background thread. """
+        self.thread = threading.Thread(target=self.run,
+                                       name='flask-compressor-warm-up')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _warm(self, bundle):
+        start = timer()
+        error = None
+        try:
+            warm_bundle(bundle)
+        except Exception as e:
+            error = '{}: {}'.format(type(e).__name__, e)
+            self.errors[bundle.name] = error
+            self.app.logger.exception("Flask-Compressor: can't warm bundle "
+                                      "'%s'", bundle.name)
+
+        duration = timer() - start
+        self.durations[bundle.name] = duration
+        self.app.logger.debug('Flask-Compressor: bundle %s warmed in %.3fs '
+                              '(%d/%d)', bundle.name, duration, self.done,
+                              self.total)
+        bundle_warmed.send(self.app, name=bundle.name, duration=duration,
+                           error=error)
+
+    def to_dict(self):
+        """ Return the progress of the warm-up as a dict, which can be
+        serialized as JSON. """
+        return {
+            'ready': self.is_ready(),
+            'total': self.total,
+            'done': self.done,
+            'duration': self.duration,
+            'evictions': self.evictions,
+            'bundles': self.durations.copy(),
+            'errors': self.errors.copy(),
+        }
@@ -21,9 +21,14 @@ setup(
     author_email='laurent@deltalima.net',
     url='https://github.com/lmeunier/flask-compressor',
     packages=['flask_compressor'],
+    package_data={'flask_compressor': ['lessc_worker.js']},
     include_package_data=True,
     zip_safe=False,
     install_requires=['Flask'],
+    extras_require={
+        'brotli': ['brotli'],
+        'xxhash': ['xxhash'],
+    },
     test_suite="tests",
     classifiers=[
         'Development Status :: 4 - Beta',
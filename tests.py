@@ -8,13 +8,63 @@
 
 from __future__ import unicode_literals, absolute_import, division, \
     print_function
+import gc
+import io
+import hashlib
 import os
+import sys
+import time
+import threading
+import gzip
+import json
+import shutil
+import weakref
 import unittest
 import flask
 import tempfile
 from flask_compressor import Compressor, Bundle, Asset, FileAsset, \
     CompressorException, JSBundle, CSSBundle
-from flask_compressor.processors import DEFAULT_PROCESSORS
+from flask_compressor.exceptions import CompressorProcessorException
+from flask_compressor.processors import DEFAULT_PROCESSORS, import_minifier
+from flask_compressor.minify import minify_css, minify_js
+from flask_compressor.cache import FileSystemCache, LRUCache
+from flask_compressor import cache as cache_module
+from flask_compressor import encoding
+from flask_compressor.lessc import LesscWorkerPool
+from flask_compressor.fingerprint import fingerprint
+from flask_compressor.signals import processor_called, content_served
+from flask_compressor.warmup import WarmUp, warm_bundle
+from flask_compressor.preload import get_preload_links
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def upper_processor(content):
+    # a processor defined at the top level, so it can be used with a pool of
+    # processes
+    if flask.current_app.debug:
+        return content
+    return '{}:{}'.format(os.getpid(), content.upper())
+
+
+def get_or_set_in_process(cache_dir, calls_filename):
+    # read a value from a cache shared by several processes, the value is
+    # slow to compute and each computation is logged in `calls_filename`
+    def compute():
+        with open(calls_filename, 'a') as handle:
+            handle.write('{}\n'.format(os.getpid()))
+        time.sleep(0.2)
+        return 'computed by {}'.format(os.getpid())
+
+    return FileSystemCache(cache_dir).get_or_set('foo', compute)
 
 
 class ProcessorsTestCase(unittest.TestCase):
@@ -92,6 +142,26 @@ class ProcessorsTestCase(unittest.TestCase):
         processed_content = processor('some garbage')
         self.assertEqual(processed_content, 'FOOBARsome garbage')
 
+    def test_minifiers_are_imported_on_first_use(self):
+        import subprocess
+        code = (
+            'import sys, flask\n'
+            'from flask_compressor import Compressor, Bundle, Asset\n'
+            'app = flask.Flask(__name__)\n'
+            'compressor = Compressor(app)\n'
+            'compressor.register_bundle(Bundle("b", assets=[Asset("x")]))\n'
+            'print("cssmin" in sys.modules, "jsmin" in sys.modules)\n'
+            'with app.test_request_context():\n'
+            '    compressor.get_processor("cssmin")("a { }")\n'
+            'print("cssmin" in sys.modules, "jsmin" in sys.modules)\n'
+        )
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         cwd=os.path.dirname(__file__) or '.')
+        lines = output.decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'False False')
+        if import_minifier('cssmin') is not None:
+            self.assertEqual(lines[1], 'True False')
+
 
 class CssminProcessorTestCase(unittest.TestCase):
     def setUp(self):
@@ -118,6 +188,101 @@ class CssminProcessorTestCase(unittest.TestCase):
             self.assertEqual(processed_content, 'html{background-color:red}')
 
 
+class MinifyTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+    def test_processors_are_present(self):
+        self.compressor.get_processor('builtin_cssmin')
+        self.compressor.get_processor('builtin_jsmin')
+
+    def test_minify_css(self):
+        css_content = '''
+            /* a comment */
+            html , body {
+                background-color: red ;
+                background: url( "a b.png" ), url(http://x/*y*/z.png);
+            }
+            .a :hover, .b > .c + .d { width: calc(1px + 2px) !important; }
+            @media screen and (max-width: 100px) { a { color:blue } }
+            /*! license */
+            a { content: "; }"; }
+        '''
+        self.assertEqual(
+            minify_css(css_content),
+            'html,body{background-color:red;background:url("a b.png"),'
+            'url(http://x/*y*/z.png)}.a :hover,.b>.c+.d{width:calc(1px + 2px)'
+            '!important}@media screen and (max-width:100px){a{color:blue}}'
+            '/*! license */ a{content:"; }"}'
+        )
+
+    def test_minify_js(self):
+        js_content = '''
+            /* a comment */
+            var a = 1, b = "x  y"; // another comment
+            function f(x) {
+                return /ab+c\\/[/]/gi.test( x ) ;
+            }
+            var c = a + +b - -a, d = a / 2 / b;
+            x = y
+            ++z
+            r = /re/
+            foo()
+        '''
+        self.assertEqual(
+            minify_js(js_content),
+            'var a=1,b="x  y";function f(x){return /ab+c\\/[/]/gi.test(x);}\n'
+            'var c=a+ +b- -a,d=a/2/b;x=y\n++z\nr=/re/\nfoo()'
+        )
+
+    def test_minify_js_division_after_increment(self):
+        # `/` after a postfix `++` or `--` is a division, not a regular
+        # expression
+        self.assertEqual(minify_js('x = a++ / 2 + "/ a  b  c"'),
+                         'x=a++/2+"/ a  b  c"')
+        self.assertEqual(minify_js('i-- / 2, s = "/ keep   spaces"'),
+                         'i--/2,s="/ keep   spaces"')
+        self.assertEqual(minify_js('x = a ++ / 2 / b\ny = b-- /2'),
+                         'x=a++/2/b\ny=b--/2')
+
+    @unittest.skipIf(import_minifier('cssmin') is None,
+                     'cssmin is not installed')
+    def test_same_output_as_cssmin(self):
+        css_content = '''
+            html {
+                background-color: red;
+            }
+            .a > .b, .c { margin: 0 auto; }
+        '''
+        with self.app.test_request_context():
+            self.assertEqual(
+                self.compressor.get_processor('builtin_cssmin')(css_content),
+                self.compressor.get_processor('cssmin')(css_content),
+            )
+
+    @unittest.skipIf(import_minifier('jsmin') is None,
+                     'jsmin is not installed')
+    def test_same_output_as_jsmin(self):
+        js_content = '''
+            function f(a, b) {
+                // sum
+                if (a) { return a + b; }
+                else { return /x/.test(b) }
+            }
+            f(1, 2)
+        '''
+        with self.app.test_request_context():
+            self.assertEqual(
+                self.compressor.get_processor('builtin_jsmin')(js_content),
+                self.compressor.get_processor('jsmin')(js_content),
+            )
+
+
 class BundlesTestCase(unittest.TestCase):
     def setUp(self):
         # initialize the flask app
@@ -520,5 +685,2052 @@ class CSSBundleTestCase(unittest.TestCase):
             self.assertEqual(contents, linked_content)
 
 
+class TemplateHelperTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        compressor.register_bundle(CSSBundle(
+            name='test_bundle',
+            assets=[Asset(content='first asset')],
+        ))
+
+    def render(self, inline=True):
+        return flask.render_template_string(
+            "{{ compressor('test_bundle', inline=inline) }}", inline=inline
+        )
+
+    def test_render(self):
+        with self.app.test_request_context():
+            self.assertEqual(
+                self.render(),
+                '<style type="text/css">first asset</style>'
+            )
+            self.assertIn('/_compressor/bundle/test_bundle_v',
+                          self.render(inline=False))
+
+    def test_markup_is_cached(self):
+        with self.app.test_request_context():
+            helper = self.app.jinja_env.globals['compressor']
+            markup = helper('test_bundle')
+            self.assertIs(helper('test_bundle'), markup)
+            self.assertIsNot(helper('test_bundle', inline=False), markup)
+            self.assertEqual(len(self.compressor.markup_cache), 2)
+
+            # replace the bundle
+            self.compressor.register_bundle(CSSBundle(
+                name='test_bundle',
+                assets=[Asset(content='modified asset')],
+            ), replace=True)
+            self.assertEqual(len(self.compressor.markup_cache), 0)
+            self.assertEqual(
+                helper('test_bundle'),
+                '<style type="text/css">modified asset</style>'
+            )
+
+    def test_not_cached_in_debug_mode(self):
+        self.app.debug = True
+        with self.app.test_request_context():
+            self.render()
+            self.assertEqual(self.compressor.markup_cache, {})
+
+
+class PreloadTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        compressor.register_bundle(CSSBundle(
+            name='css_bundle',
+            assets=[Asset(content='first asset'),
+                    Asset(content='second asset')],
+        ))
+        compressor.register_bundle(JSBundle(
+            name='js_bundle',
+            assets=[Asset(content='third asset')],
+        ))
+        compressor.register_bundle(Bundle(
+            name='txt_bundle',
+            assets=[Asset(content='fourth asset')],
+        ))
+
+        @app.route('/')
+        def index():
+            return flask.render_template_string(
+                "{{ compressor('css_bundle', inline=False) }}"
+                "{{ compressor('js_bundle', inline=False) }}"
+                "{{ compressor('css_bundle', inline=False) }}"
+                "{{ compressor('js_bundle') }}"
+                "{{ compressor('txt_bundle', inline=False) }}"
+            )
+
+        with app.test_request_context():
+            self.css_url = compressor.get_bundle('css_bundle').url
+            self.js_url = compressor.get_bundle('js_bundle').url
+
+    def test_link_headers(self):
+        rv = self.app.test_client().get('/')
+        self.assertEqual(rv.headers.getlist('Link'), [
+            '<{}>; rel=preload; as=style'.format(self.css_url),
+            '<{}>; rel=preload; as=script'.format(self.js_url),
+        ])
+
+        # each asset is preloaded in debug mode
+        self.app.debug = True
+        rv = self.app.test_client().get('/')
+        links = rv.headers.getlist('Link')
+        self.assertEqual(len(links), 3)
+        self.assertIn('/_compressor/bundle/css_bundle/asset/0_v', links[0])
+
+    def test_unknown_bundle(self):
+        with self.app.test_request_context():
+            helper = self.app.jinja_env.globals['compressor']
+            self.assertRaises(CompressorException, helper, 'foo',
+                              inline=False)
+            # the bundle is not recorded, so the headers of the error
+            # response can be built
+            self.assertEqual(get_preload_links(), [])
+
+    def test_disabled(self):
+        self.app.config['COMPRESSOR_PRELOAD_HEADERS'] = False
+        rv = self.app.test_client().get('/')
+        self.assertNotIn('Link', rv.headers)
+
+    def test_early_hints(self):
+        app = flask.Flask(__name__)
+        app.config['COMPRESSOR_EARLY_HINTS'] = True
+        compressor = Compressor(app)
+        compressor.register_bundle(JSBundle(
+            name='js_bundle',
+            assets=[Asset(content='asset')],
+        ))
+
+        @app.route('/')
+        def index():
+            return flask.render_template_string(
+                "{{ compressor('js_bundle', inline=False) }}"
+            )
+
+        hints = []
+        environ = {'flask_compressor.early_hints': hints.append}
+
+        # the linked bundles are not known before the first response
+        app.test_client().get('/', environ_base=environ)
+        self.assertEqual(hints, [])
+        link = compressor.early_hints['index'][0]
+
+        app.test_client().get('/', environ_base=environ)
+        self.assertEqual(hints, [[('Link', link)]])
+
+        # nothing is sent if the environ has no callable
+        app.test_client().get('/')
+        self.assertEqual(len(hints), 1)
+
+    def test_early_hints_environ_key(self):
+        app = flask.Flask(__name__)
+        app.config['COMPRESSOR_EARLY_HINTS'] = True
+        app.config['COMPRESSOR_EARLY_HINTS_ENVIRON_KEY'] = 'myserver.hints'
+        compressor = Compressor(app)
+        compressor.register_bundle(JSBundle(
+            name='js_bundle',
+            assets=[Asset(content='asset')],
+        ))
+
+        @app.route('/')
+        def index():
+            return flask.render_template_string(
+                "{{ compressor('js_bundle', inline=False) }}"
+            )
+
+        # a middleware providing the callable
+        hints = []
+
+        def early_hints_middleware(environ, start_response):
+            environ['myserver.hints'] = hints.append
+            return wsgi_app(environ, start_response)
+
+        wsgi_app = app.wsgi_app
+        app.wsgi_app = early_hints_middleware
+
+        client = app.test_client()
+        client.get('/')
+        client.get('/')
+        link = compressor.early_hints['index'][0]
+        self.assertEqual(hints, [[('Link', link)]])
+
+
+class FileSystemCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_CACHE_DIR'] = self.cache_dir
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        # count how many times the processor is called
+        self.calls = []
+
+        def test1(content):
+            self.calls.append(content)
+            return "FOOBAR" + str(content)
+
+        compressor.register_processor(test1)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def create_bundle(self):
+        return Bundle(
+            name='test_bundle',
+            assets=[
+                Asset(content='first asset', processors=['test1']),
+                Asset(content='second asset'),
+            ],
+            processors=['test1']
+        )
+
+    def test_cache_enabled(self):
+        self.assertIsInstance(self.compressor.cache, FileSystemCache)
+
+    def test_get_set(self):
+        cache = self.compressor.cache
+        self.assertIsNone(cache.get('foo'))
+        cache.set('foo', 'bar \u00e9')
+        self.assertEqual(cache.get('foo'), 'bar \u00e9')
+        cache.clear()
+        self.assertIsNone(cache.get('foo'))
+
+    def test_cache_survives_new_objects(self):
+        with self.app.test_request_context():
+            content = self.create_bundle().get_content()
+            contents = self.create_bundle().get_contents()
+            self.assertEqual(len(self.calls), 4)
+
+            # new objects (like after a restart) read from the cache
+            self.assertEqual(self.create_bundle().get_content(), content)
+            self.assertEqual(self.create_bundle().get_contents(), contents)
+            self.assertEqual(len(self.calls), 4)
+
+    def test_cache_key_uses_sources(self):
+        with self.app.test_request_context():
+            bundle = self.create_bundle()
+            bundle.get_content()
+            calls = len(self.calls)
+
+            bundle = self.create_bundle()
+            bundle.processors = []
+            self.assertEqual(bundle.get_content(),
+                             'FOOBARfirst asset\nsecond asset')
+            self.assertEqual(len(self.calls), calls)
+
+            bundle = self.create_bundle()
+            bundle.assets[1]._raw_content = 'modified asset'
+            bundle.get_content()
+            self.assertEqual(len(self.calls), calls + 1)
+
+    def test_cache_key_uses_processor_versions(self):
+        with self.app.test_request_context():
+            content = self.create_bundle().get_content()
+            calls = len(self.calls)
+
+            # a new version of the processor, like after an upgrade
+            processor = self.compressor.get_processor('test1')
+            processor.version = '2'
+            self.assertEqual(self.create_bundle().get_content(), content)
+            self.assertEqual(len(self.calls), calls + 2)
+
+    def test_get_or_set(self):
+        cache = self.compressor.cache
+        self.assertEqual(cache.get_or_set('foo', lambda: 'bar'), 'bar')
+        self.assertEqual(cache.get_or_set('foo', lambda: 'baz'), 'bar')
+        self.assertEqual(cache.get_stats()['misses'], 1)
+        self.assertEqual(cache.get_stats()['hits'], 1)
+
+    @unittest.skipIf(cache_module.fcntl is None, 'requires fcntl')
+    def test_get_or_set_across_processes(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        calls_filename = os.path.join(self.cache_dir, 'calls.txt')
+        with ProcessPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(get_or_set_in_process, self.cache_dir,
+                                   calls_filename) for _ in range(3)]
+            results = [future.result() for future in futures]
+
+        # computed by one process, read by the others
+        with open(calls_filename) as handle:
+            self.assertEqual(len(handle.readlines()), 1)
+        self.assertEqual(len(set(results)), 1)
+
+    def run_with_timeout(self, func, timeout=10):
+        # fail instead of hanging if `func` deadlocks
+        results = []
+        thread = threading.Thread(target=lambda: results.append(func()))
+        thread.daemon = True
+        thread.start()
+        thread.join(timeout)
+        self.assertFalse(thread.is_alive(), 'deadlock')
+        return results[0]
+
+    @unittest.skipIf(cache_module.fcntl is None, 'requires fcntl')
+    def test_nested_get_or_set(self):
+        cache = self.compressor.cache
+
+        # with more nested keys than 256 lock files, two keys would share a
+        # lock file (pigeonhole principle)
+        def nested(depth):
+            if depth == 300:
+                return 'value'
+            return cache.get_or_set('key{}'.format(depth),
+                                    lambda: nested(depth + 1))
+
+        self.assertEqual(self.run_with_timeout(lambda: nested(0)), 'value')
+
+        # a bundle locks its key while its assets lock theirs, in the
+        # current thread and in the threads of an executor
+        for executor in (None, 'thread'):
+            app = flask.Flask(__name__)
+            app.config['COMPRESSOR_CACHE_DIR'] = self.cache_dir
+            app.config['COMPRESSOR_EXECUTOR'] = executor
+            compressor = Compressor(app)
+            compressor.register_bundle(CSSBundle(
+                'bundle',
+                assets=[Asset('{}_{}'.format(executor, i)) for i in range(30)]
+            ))
+
+            def get_content():
+                with app.test_request_context():
+                    return compressor.get_bundle('bundle').get_content()
+
+            self.assertEqual(self.run_with_timeout(get_content).count('\n'),
+                             29)
+
+    def test_lock_files_are_removed(self):
+        cache = FileSystemCache(self.cache_dir, max_size=None)
+        cache.get_or_set('foo', lambda: 'bar')
+        lock_filename = cache.locks._get_filename('foo')
+        self.assertTrue(os.path.exists(lock_filename))
+        cache.clear()
+        self.assertFalse(os.path.exists(lock_filename))
+
+    def test_eviction(self):
+        cache = FileSystemCache(self.cache_dir, max_size=10)
+        cache.set('foo', '12345')
+        cache.set('bar', '67890')
+        os.utime(cache._get_filename('foo'), (100, 100))
+        os.utime(cache._get_filename('bar'), (200, 200))
+
+        # reading a value marks it as recently used
+        self.assertEqual(cache.get('foo'), '12345')
+        cache.set('baz', 'abcde')
+        self.assertIsNone(cache.get('bar'))
+        self.assertEqual(cache.get('foo'), '12345')
+        self.assertEqual(cache.get('baz'), 'abcde')
+
+
+class ChunkTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        def upper(content):
+            return content.upper()
+
+        compressor.register_processor(upper)
+        compressor.register_bundle(self.create_bundle())
+
+    def create_bundle(self, first_asset='a' * 10, last_asset='last'):
+        # with a chunk size of 100 bytes, a chunk always ends after the
+        # `f` asset (see `is_chunk_boundary()`), and the `h` asset is bigger
+        # than a chunk
+        return JSBundle(
+            name='test_bundle',
+            assets=[
+                Asset(content=first_asset),
+                Asset(content='b' * 10),
+                Asset(content='c' * 25),
+                Asset(content='f' * 25),
+                Asset(content='h' * 120),
+                Asset(content='d' * 10),
+                Asset(content=last_asset),
+            ],
+            processors=['upper'],
+            chunk_size=100,
+        )
+
+    def test_chunks(self):
+        with self.app.test_request_context():
+            bundle = self.compressor.get_bundle('test_bundle')
+            self.assertEqual(bundle.get_chunk_indexes(),
+                             [[0, 1, 2, 3], [4], [5, 6]])
+            chunks = bundle.chunks
+            self.assertIs(bundle.chunks[0], chunks[0])
+            self.assertEqual(
+                [chunk.get_content() for chunk in chunks],
+                ['\n'.join(['A' * 10, 'B' * 10, 'C' * 25, 'F' * 25]),
+                 'H' * 120, 'D' * 10 + '\nLAST']
+            )
+            self.assertEqual(len(set(chunk.hash for chunk in chunks)), 3)
+            self.assertEqual(
+                chunks[1].url,
+                '/_compressor/bundle/test_bundle/chunk/{}.js'.format(
+                    chunks[1].hash
+                )
+            )
+
+            # the whole bundle is still available
+            self.assertEqual(bundle.get_content().count('\n'), 6)
+
+    def test_not_split(self):
+        with self.app.test_request_context():
+            bundle = Bundle(name='other_bundle', assets=[Asset('a')])
+            self.assertIsNone(bundle.get_chunk_indexes())
+            self.assertEqual(bundle.chunks, [])
+
+    def test_linked_content(self):
+        with self.app.test_request_context():
+            bundle = self.compressor.get_bundle('test_bundle')
+            rendered = flask.render_template_string(
+                "{{ compressor('test_bundle', inline=False) }}"
+            )
+            self.assertEqual(rendered, '\n'.join(
+                '<script type="text/javascript" src="{}"></script>'
+                ''.format(chunk.url) for chunk in bundle.chunks
+            ))
+            self.assertNotIn(bundle.url, rendered)
+
+            # each chunk is preloaded
+            self.assertEqual(len(bundle.get_preload_links()), 3)
+
+    def test_render_chunk(self):
+        with self.app.test_request_context():
+            bundle = self.compressor.get_bundle('test_bundle')
+            urls = [chunk.url for chunk in bundle.chunks]
+
+        client = self.app.test_client()
+        rv = client.get(urls[2])
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.data, b'DDDDDDDDDD\nLAST')
+        self.assertEqual(rv.mimetype, 'text/javascript')
+
+        rv = client.get(urls[2].replace('/chunk/', '/chunk/0'))
+        self.assertEqual(rv.status_code, 404)
+
+    def replace_bundle(self, **kwargs):
+        with self.app.test_request_context():
+            bundle = self.compressor.get_bundle('test_bundle')
+            urls = [chunk.url for chunk in bundle.chunks]
+
+            self.compressor.register_bundle(self.create_bundle(**kwargs),
+                                            replace=True)
+            bundle = self.compressor.get_bundle('test_bundle')
+            new_urls = [chunk.url for chunk in bundle.chunks]
+            indexes = bundle.get_chunk_indexes()
+        return urls, new_urls, indexes
+
+    def test_partial_change(self):
+        urls, new_urls, indexes = self.replace_bundle(last_asset='modified')
+
+        # only the URL of the modified chunk changes
+        self.assertEqual(indexes, [[0, 1, 2, 3], [4], [5, 6]])
+        self.assertEqual(new_urls[:2], urls[:2])
+        self.assertNotEqual(new_urls[2], urls[2])
+
+    def test_partial_change_of_first_asset(self):
+        # the first asset grows, and now ends its own chunk
+        urls, new_urls, indexes = self.replace_bundle(first_asset='a' * 40)
+
+        # boundaries after the modified chunk don't move, the URLs of the
+        # next chunks don't change (even if their positions change)
+        self.assertEqual(indexes, [[0], [1, 2, 3], [4], [5, 6]])
+        self.assertEqual(new_urls[2:], urls[1:])
+        self.assertNotIn(new_urls[0], urls)
+        self.assertNotIn(new_urls[1], urls)
+
+        # the moved chunks are still served
+        rv = self.app.test_client().get(new_urls[3])
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.data, b'DDDDDDDDDD\nLAST')
+
+    def test_build(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+
+        with self.app.test_request_context():
+            bundle = self.compressor.get_bundle('test_bundle')
+            urls = [chunk.url for chunk in bundle.chunks]
+            manifest = self.compressor.build(output_dir)
+            entry = manifest.get_bundle('test_bundle')
+            self.assertEqual([chunk['assets'] for chunk in entry['chunks']],
+                             [[0, 1, 2, 3], [4], [5, 6]])
+            self.assertEqual(manifest.read(manifest.get_chunk('test_bundle',
+                                                              2)),
+                             'DDDDDDDDDD\nLAST')
+
+        # serve the chunks from the build, without processing assets
+        app = flask.Flask(__name__)
+        app.config['COMPRESSOR_MANIFEST'] = os.path.join(output_dir,
+                                                         'manifest.json')
+        compressor = Compressor(app)
+
+        def upper(content):
+            raise AssertionError('processors must not be called')
+
+        compressor.register_processor(upper)
+        compressor.register_bundle(self.create_bundle())
+        with app.test_request_context():
+            bundle = compressor.get_bundle('test_bundle')
+            self.assertEqual([chunk.url for chunk in bundle.chunks], urls)
+
+        rv = app.test_client().get(urls[1])
+        self.assertEqual(rv.data, b'H' * 120)
+
+
+class CommonBundlesTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        def create_bundle(name, contents):
+            compressor.register_bundle(JSBundle(
+                name=name,
+                assets=[Asset(content=content) for content in contents],
+            ))
+
+        create_bundle('page_a', ['vendor', 'lib', 'a'])
+        create_bundle('page_b', ['vendor', 'lib', 'b'])
+        create_bundle('page_c', ['vendor', 'c'])
+        create_bundle('page_d', ['d', 'vendor'])
+        compressor.register_bundle(CSSBundle(
+            name='style', assets=[Asset(content='vendor')]
+        ))
+
+    def get_contents(self, name):
+        with self.app.test_request_context():
+            bundle = self.compressor.get_bundle(name)
+            return [asset.content for asset in bundle.assets]
+
+    def test_extract(self):
+        common_bundles = self.compressor.extract_common_bundles()
+        self.assertEqual([bundle.name for bundle in common_bundles],
+                         ['common_js', 'common_js_2'])
+        self.assertEqual(self.get_contents('common_js'), ['vendor'])
+        self.assertEqual(self.get_contents('common_js_2'), ['lib'])
+        self.assertIsInstance(common_bundles[0], JSBundle)
+
+        self.assertEqual(self.get_contents('page_a'), ['a'])
+        self.assertEqual(self.get_contents('page_b'), ['b'])
+        self.assertEqual(self.get_contents('page_c'), ['c'])
+        # only leading assets are extracted
+        self.assertEqual(self.get_contents('page_d'), ['d', 'vendor'])
+        self.assertEqual(self.get_contents('style'), ['vendor'])
+
+        self.assertEqual(self.compressor.common_bundles, {
+            'page_a': ['common_js', 'common_js_2'],
+            'page_b': ['common_js', 'common_js_2'],
+            'page_c': ['common_js'],
+        })
+
+    def test_min_bundles(self):
+        common_bundles = self.compressor.extract_common_bundles(min_bundles=3)
+        self.assertEqual(len(common_bundles), 1)
+        self.assertEqual(self.get_contents('page_a'), ['lib', 'a'])
+
+        self.assertRaises(CompressorException,
+                          self.compressor.extract_common_bundles,
+                          min_bundles=1)
+
+    def test_template_helper(self):
+        self.compressor.extract_common_bundles()
+        with self.app.test_request_context():
+            urls = dict(
+                (name, self.compressor.get_bundle(name).url)
+                for name in ['common_js', 'common_js_2', 'page_a', 'page_c']
+            )
+            rendered = flask.render_template_string(
+                "{{ compressor('page_a', inline=False) }}\n"
+                "{{ compressor('page_c', inline=False) }}"
+            )
+        self.assertEqual(rendered, '\n'.join(
+            '<script type="text/javascript" src="{}"></script>'
+            ''.format(urls[name])
+            for name in ['common_js', 'common_js_2', 'page_a', 'page_c']
+        ))
+
+        with self.app.test_request_context():
+            rendered = flask.render_template_string(
+                "{{ compressor('page_b') }}"
+            )
+        self.assertEqual(rendered, '\n'.join(
+            '<script type="text/javascript">{}</script>'.format(content)
+            for content in ['vendor', 'lib', 'b']
+        ))
+
+    def test_replace_bundle(self):
+        self.compressor.extract_common_bundles()
+        self.compressor.register_bundle(JSBundle(
+            name='page_a', assets=[Asset(content='a')]
+        ), replace=True)
+        self.assertNotIn('page_a', self.compressor.common_bundles)
+
+
+class ManifestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        def test1(content):
+            return "FOOBAR" + str(content)
+
+        compressor.register_processor(test1)
+        compressor.register_bundle(self.create_bundle())
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def create_bundle(self):
+        return CSSBundle(
+            name='test_bundle',
+            assets=[
+                Asset(content='first asset', processors=['test1']),
+                Asset(content='second asset'),
+            ],
+            processors=['test1']
+        )
+
+    def create_production_app(self):
+        # an app serving bundles from the manifest, with a processor that
+        # fails if it's called
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_MANIFEST'] = os.path.join(self.output_dir,
+                                                         'manifest.json')
+        compressor = Compressor(app)
+
+        def test1(content):
+            raise AssertionError('processors must not be called')
+
+        compressor.register_processor(test1)
+        compressor.register_bundle(self.create_bundle())
+        return app
+
+    def test_build(self):
+        with self.app.test_request_context():
+            bundle = self.compressor.get_bundle('test_bundle')
+            manifest = self.compressor.build(self.output_dir)
+            entry = manifest.get_bundle('test_bundle')
+            self.assertEqual(entry['hash'], bundle.hash)
+            self.assertEqual(entry['url'], bundle.url)
+            self.assertEqual(entry['mimetype'], 'text/css')
+            self.assertEqual(entry['size'], len(bundle.get_content()))
+            self.assertEqual(manifest.read(entry), bundle.get_content())
+            self.assertEqual(len(entry['assets']), 2)
+            self.assertEqual(manifest.read(entry['assets'][0]),
+                             'FOOBARfirst asset')
+
+        with open(os.path.join(self.output_dir, 'manifest.json')) as handle:
+            data = json.load(handle)
+        self.assertIn('test_bundle', data['bundles'])
+
+    def test_build_command(self):
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['compressor', 'build', self.output_dir])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('test_bundle -> bundle/test_bundle_v', result.output)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.output_dir, 'manifest.json')
+        ))
+
+    def test_manifest_runtime(self):
+        with self.app.test_request_context():
+            bundle = self.compressor.get_bundle('test_bundle')
+            content = bundle.get_content()
+            url = bundle.url
+            asset_url = bundle.assets[0].url
+            self.compressor.build(self.output_dir)
+
+        app = self.create_production_app()
+        with app.test_request_context():
+            bundle = app.extensions['compressor'].get_bundle('test_bundle')
+            self.assertEqual(bundle.get_content(), content)
+            self.assertEqual(bundle.url, url)
+            self.assertEqual(bundle.assets[0].content, 'FOOBARfirst asset')
+
+            rendered = flask.render_template_string(
+                "{{ compressor('test_bundle', inline=False) }}"
+            )
+            self.assertIn(url, rendered)
+
+        client = app.test_client()
+        rv = client.get(url)
+        self.assertEqual(rv.data.decode('utf8'), content)
+        rv = client.get(asset_url)
+        self.assertEqual(rv.data.decode('utf8'), 'FOOBARfirst asset')
+
+    def test_encoded_files(self):
+        with self.app.test_request_context():
+            bundle = self.compressor.get_bundle('test_bundle')
+            content = bundle.get_content()
+            url = bundle.url
+            manifest = self.compressor.build(self.output_dir)
+            entry = manifest.get_bundle('test_bundle')
+            gzip_entry = manifest.get_encoded(entry, 'gzip')
+            self.assertEqual(gzip_entry['filename'],
+                             entry['filename'] + '.gz')
+            self.assertTrue(os.path.exists(manifest.get_path(gzip_entry)))
+            self.assertIsNotNone(
+                manifest.get_encoded(entry['assets'][0], 'gzip')
+            )
+            self.assertEqual(manifest.get_encoded(entry, 'br') is not None,
+                             brotli is not None)
+
+        # the compressed files of the build are served, contents are never
+        # compressed by the workers
+        def fail(data):
+            raise AssertionError('contents must not be compressed')
+
+        for name in ('gzip', 'br'):
+            self.addCleanup(encoding.ENCODERS.__setitem__, name,
+                            encoding.ENCODERS[name])
+            encoding.ENCODERS[name] = fail
+
+        app = self.create_production_app()
+        rv = app.test_client().get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(rv.data)).read()
+                         .decode('utf8'), content)
+
+    def test_missing_manifest(self):
+        app = flask.Flask(__name__)
+        app.config['COMPRESSOR_MANIFEST'] = os.path.join(self.output_dir,
+                                                         'manifest.json')
+        self.assertRaises(CompressorException, Compressor, app)
+
+
+class EncodingTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        # our bundle
+        bundle = CSSBundle(
+            name='test_bundle',
+            assets=[
+                Asset(content='first asset ' * 100),
+                Asset(content='second asset'),
+            ],
+        )
+        self.bundle = bundle
+        compressor.register_bundle(bundle)
+
+        with app.test_request_context():
+            self.bundle_url = bundle.url
+            self.asset_url = bundle.assets[0].url
+            self.content = bundle.get_content()
+
+    def test_identity(self):
+        rv = self.app.test_client().get(self.bundle_url)
+        self.assertNotIn('Content-Encoding', rv.headers)
+        self.assertIn('Accept-Encoding', rv.headers['Vary'])
+        self.assertEqual(rv.data.decode('utf8'), self.content)
+
+    def test_gzip(self):
+        rv = self.app.test_client().get(
+            self.bundle_url, headers={'Accept-Encoding': 'gzip, deflate'}
+        )
+        self.assertEqual(rv.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', rv.headers['Vary'])
+        self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(rv.data)).read()
+                         .decode('utf8'), self.content)
+
+        rv = self.app.test_client().get(
+            self.asset_url, headers={'Accept-Encoding': 'gzip'}
+        )
+        self.assertEqual(rv.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(rv.data)).read()
+                         .decode('utf8'), 'first asset ' * 100)
+
+    def test_gzip_is_deterministic(self):
+        self.assertEqual(encoding.gzip_encode(b'foobar'),
+                         encoding.gzip_encode(b'foobar'))
+
+    @unittest.skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        rv = self.app.test_client().get(
+            self.bundle_url, headers={'Accept-Encoding': 'gzip, br'}
+        )
+        self.assertEqual(rv.headers['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(rv.data).decode('utf8'),
+                         self.content)
+
+    def test_quality(self):
+        rv = self.app.test_client().get(
+            self.bundle_url, headers={'Accept-Encoding': 'gzip;q=0.5, br;q=0'}
+        )
+        self.assertEqual(rv.headers['Content-Encoding'], 'gzip')
+
+    def test_disabled(self):
+        self.app.config['COMPRESSOR_ENCODINGS'] = []
+        rv = self.app.test_client().get(
+            self.bundle_url, headers={'Accept-Encoding': 'gzip, br'}
+        )
+        self.assertNotIn('Content-Encoding', rv.headers)
+        self.assertNotIn('Vary', rv.headers)
+
+
+class ConditionalRequestTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        # count how many times the content is evaluated
+        self.calls = []
+
+        def test1(content):
+            self.calls.append(content)
+            return "FOOBAR" + str(content)
+
+        compressor.register_processor(test1)
+
+        # our bundle
+        bundle = CSSBundle(
+            name='test_bundle',
+            assets=[Asset(content='first asset', processors=['test1'])],
+        )
+        self.bundle = bundle
+        compressor.register_bundle(bundle)
+
+        with app.test_request_context():
+            self.bundle_url = bundle.url
+            self.bundle_hash = bundle.hash
+
+    def test_headers(self):
+        rv = self.app.test_client().get(self.bundle_url)
+        self.assertEqual(rv.headers['ETag'], '"{}"'.format(self.bundle_hash))
+        self.assertEqual(rv.headers['Cache-Control'],
+                         'public, max-age=31536000, immutable')
+
+        rv = self.app.test_client().get(
+            self.bundle_url, headers={'Accept-Encoding': 'gzip'}
+        )
+        self.assertEqual(rv.headers['ETag'],
+                         '"{}-gzip"'.format(self.bundle_hash))
+
+    def test_not_modified(self):
+        rv = self.app.test_client().get(
+            self.bundle_url,
+            headers={'If-None-Match': '"{}"'.format(self.bundle_hash)}
+        )
+        self.assertEqual(rv.status_code, 304)
+        self.assertEqual(rv.data, b'')
+        self.assertEqual(rv.headers['ETag'], '"{}"'.format(self.bundle_hash))
+
+        rv = self.app.test_client().get(
+            self.bundle_url,
+            headers={'If-None-Match': '"{}"'.format(self.bundle_hash),
+                     'Accept-Encoding': 'gzip'}
+        )
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.headers['Content-Encoding'], 'gzip')
+
+        rv = self.app.test_client().get(
+            self.bundle_url, headers={'If-None-Match': '"wrong hash"'}
+        )
+        self.assertEqual(rv.status_code, 200)
+
+    def test_debug_cache_control(self):
+        self.app.debug = True
+        self.app.config['COMPRESSOR_DEBUG_CACHE_CONTROL'] = 'no-store'
+        with self.app.test_request_context():
+            url = self.bundle.url
+
+        rv = self.app.test_client().get(url)
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.headers['Cache-Control'], 'no-store')
+
+        rv = self.app.test_client().get(
+            url, headers={'If-None-Match': rv.headers['ETag']}
+        )
+        self.assertEqual(rv.status_code, 304)
+        self.assertEqual(rv.headers['Cache-Control'], 'no-store')
+
+
+class StreamingTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_STREAM_CHUNK_SIZE'] = 100
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        # our bundle
+        bundle = JSBundle(
+            name='test_bundle',
+            assets=[Asset(content='a' * 1000), Asset(content='b' * 50)],
+        )
+        self.bundle = bundle
+        compressor.register_bundle(bundle)
+
+        with app.test_request_context():
+            self.bundle_url = bundle.url
+            self.asset_url = bundle.assets[1].url
+            self.content = bundle.get_content()
+
+    def test_stream_large_content(self):
+        rv = self.app.test_client().get(self.bundle_url, buffered=False)
+        self.assertTrue(rv.is_streamed)
+        self.assertEqual(rv.content_length, 1051)
+        chunks = list(rv.response)
+        self.assertEqual(len(chunks), 11)
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertEqual(b''.join(chunks).decode('utf8'), self.content)
+
+    def test_small_content(self):
+        rv = self.app.test_client().get(self.asset_url)
+        self.assertEqual(rv.content_length, 50)
+        self.assertEqual(rv.data.decode('utf8'), 'b' * 50)
+
+    def test_stream_disabled(self):
+        self.app.config['COMPRESSOR_STREAM_CHUNK_SIZE'] = None
+        rv = self.app.test_client().get(self.bundle_url, buffered=False)
+        self.assertEqual(len(list(rv.response)), 1)
+        self.assertEqual(rv.content_length, 1051)
+
+    def test_stream_from_manifest(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        with self.app.app_context():
+            self.compressor.build(output_dir)
+
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_MANIFEST'] = os.path.join(output_dir,
+                                                         'manifest.json')
+        compressor = Compressor(app)
+        compressor.register_bundle(JSBundle(name='test_bundle'))
+
+        rv = app.test_client().get(self.bundle_url, buffered=False)
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.content_length, 1051)
+        self.assertEqual(b''.join(rv.response).decode('utf8'), self.content)
+        rv.close()
+
+
+class RangeTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_ENCODINGS'] = []
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        # our bundle
+        bundle = JSBundle(
+            name='test_bundle',
+            assets=[Asset(content='0123456789'), Asset(content='abcdefghi')],
+        )
+        compressor.register_bundle(bundle)
+
+        with app.test_request_context():
+            self.bundle_url = bundle.url
+            self.etag = bundle.hash
+
+    def get(self, **headers):
+        return self.app.test_client().get(self.bundle_url,
+                                          headers=list(headers.items()))
+
+    def test_accept_ranges(self):
+        rv = self.get()
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.headers['Accept-Ranges'], 'bytes')
+
+    def test_single_range(self):
+        rv = self.get(Range='bytes=2-5')
+        self.assertEqual(rv.status_code, 206)
+        self.assertEqual(rv.data, b'2345')
+        self.assertEqual(rv.content_length, 4)
+        self.assertEqual(rv.headers['Content-Range'], 'bytes 2-5/20')
+
+        rv = self.get(Range='bytes=-3')
+        self.assertEqual(rv.data, b'ghi')
+        self.assertEqual(rv.headers['Content-Range'], 'bytes 17-19/20')
+
+        rv = self.get(Range='bytes=15-')
+        self.assertEqual(rv.data, b'efghi')
+
+        # the end of the range is after the end of the content
+        rv = self.get(Range='bytes=18-100')
+        self.assertEqual(rv.data, b'hi')
+
+    def test_multiple_ranges(self):
+        rv = self.get(Range='bytes=0-1,-2')
+        self.assertEqual(rv.status_code, 206)
+        self.assertEqual(rv.mimetype, 'multipart/byteranges')
+        boundary = rv.mimetype_params['boundary']
+        self.assertEqual(
+            rv.data.decode('ascii'),
+            '--{0}\r\nContent-Type: text/javascript\r\n'
+            'Content-Range: bytes 0-1/20\r\n\r\n01\r\n'
+            '--{0}\r\nContent-Type: text/javascript\r\n'
+            'Content-Range: bytes 18-19/20\r\n\r\nhi\r\n'
+            '--{0}--\r\n'.format(boundary)
+        )
+        self.assertEqual(rv.content_length, len(rv.data))
+
+    def test_unsatisfiable_range(self):
+        rv = self.get(Range='bytes=30-40')
+        self.assertEqual(rv.status_code, 416)
+        self.assertEqual(rv.headers['Content-Range'], 'bytes */20')
+
+    def test_ignored_ranges(self):
+        # malformed header
+        rv = self.get(Range='bytes=5-2')
+        self.assertEqual(rv.status_code, 200)
+
+        # too many ranges
+        rv = self.get(Range='bytes=' + ','.join(['0-0'] * 20))
+        self.assertEqual(rv.status_code, 200)
+
+        # the content has changed
+        rv = self.get(Range='bytes=2-5', **{'If-Range': '"foo"'})
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(len(rv.data), 20)
+
+        rv = self.get(Range='bytes=2-5',
+                      **{'If-Range': '"{}"'.format(self.etag)})
+        self.assertEqual(rv.status_code, 206)
+
+    def test_range_from_file(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        self.app.config['COMPRESSOR_OUTPUT_DIR'] = output_dir
+
+        rv = self.get(Range='bytes=9-11')
+        self.assertEqual(rv.status_code, 206)
+        self.assertEqual(rv.data, b'9\na')
+
+
+class SendfileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_OUTPUT_DIR'] = self.output_dir
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        # our bundle
+        bundle = CSSBundle(
+            name='test_bundle',
+            assets=[Asset(content='first asset'),
+                    Asset(content='second asset')],
+        )
+        self.bundle = bundle
+        compressor.register_bundle(bundle)
+
+        with app.test_request_context():
+            self.bundle_url = bundle.url
+            self.filename = bundle.output_filename
+
+    def test_write_output_file(self):
+        rv = self.app.test_client().get(self.bundle_url, buffered=False)
+        self.assertEqual(rv.content_length, 24)
+        self.assertEqual(b''.join(rv.response), b'first asset\nsecond asset')
+        rv.close()
+
+        path = os.path.join(self.output_dir, *self.filename.split('/'))
+        with open(path, 'rb') as handle:
+            self.assertEqual(handle.read(), b'first asset\nsecond asset')
+
+    def test_write_encoded_file(self):
+        rv = self.app.test_client().get(
+            self.bundle_url, headers=[('Accept-Encoding', 'gzip')]
+        )
+        self.assertEqual(rv.headers['Content-Encoding'], 'gzip')
+        path = os.path.join(self.output_dir,
+                            *(self.filename + '.gz').split('/'))
+        with open(path, 'rb') as handle:
+            self.assertEqual(handle.read(), rv.data)
+
+    def test_x_sendfile(self):
+        self.app.config['COMPRESSOR_SENDFILE'] = 'x-sendfile'
+        rv = self.app.test_client().get(self.bundle_url)
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.data, b'')
+        self.assertEqual(rv.content_length, 24)
+        self.assertEqual(
+            rv.headers['X-Sendfile'],
+            os.path.join(os.path.abspath(self.output_dir),
+                         *self.filename.split('/'))
+        )
+        self.assertTrue(os.path.exists(rv.headers['X-Sendfile']))
+
+    def test_x_accel_redirect(self):
+        self.app.config['COMPRESSOR_SENDFILE'] = 'x-accel-redirect'
+        rv = self.app.test_client().get(
+            self.bundle_url, headers=[('Accept-Encoding', 'gzip')]
+        )
+        self.assertEqual(rv.data, b'')
+        self.assertEqual(rv.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(rv.headers['X-Accel-Redirect'],
+                         '/_compressor_files/' + self.filename + '.gz')
+
+    def test_unknown_sendfile_mode(self):
+        app = flask.Flask(__name__)
+        app.config['COMPRESSOR_SENDFILE'] = 'foobar'
+        self.assertRaises(CompressorException, Compressor, app)
+
+
+class WarmUpTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        self.calls = []
+
+        def test1(content):
+            self.calls.append(content)
+            return content.upper()
+
+        def broken(content):
+            raise CompressorProcessorException('broken')
+
+        compressor.register_processor(test1)
+        compressor.register_processor(broken)
+
+        compressor.register_bundle(CSSBundle(
+            name='test_bundle',
+            assets=[Asset(content='first asset'),
+                    Asset(content='second asset')],
+            processors=['test1'],
+        ))
+
+    def test_warm(self):
+        warm_up = self.compressor.warm()
+        self.assertTrue(warm_up.is_ready())
+        self.assertEqual((warm_up.done, warm_up.total), (1, 1))
+        self.assertEqual(list(warm_up.durations), ['test_bundle'])
+        self.assertEqual(warm_up.errors, {})
+        self.assertEqual(len(self.calls), 1)
+
+        # nothing is processed again when serving the bundle
+        with self.app.test_request_context():
+            rendered = flask.render_template_string(
+                "{{ compressor('test_bundle', inline=False) }}"
+            )
+            url = self.compressor.get_bundle('test_bundle').url
+        self.assertIn(url, rendered)
+        rv = self.app.test_client().get(url)
+        self.assertEqual(rv.data, b'FIRST ASSET\nSECOND ASSET')
+        self.assertEqual(len(self.calls), 1)
+
+    def test_warm_bundle(self):
+        with self.app.test_request_context():
+            bundle = self.compressor.get_bundle('test_bundle')
+            self.assertEqual(warm_bundle(bundle), [bundle.url])
+            self.assertEqual(len(self.calls), 1)
+
+            # assets are linked one by one in debug mode
+            self.app.debug = True
+            self.assertEqual(warm_bundle(bundle),
+                             [bundle.url] + [asset.url
+                                             for asset in bundle.assets])
+
+    def test_memory_cache_is_not_flooded(self):
+        self.compressor.register_bundle(CSSBundle(
+            name='big_bundle',
+            assets=[Asset(content='asset {}'.format(i)) for i in range(200)],
+        ))
+        warm_up = self.compressor.warm()
+        self.assertEqual(warm_up.evictions, 0)
+
+        # assets are not served one by one when debug is disabled, only
+        # their processed contents are kept
+        stats = self.compressor.memory_cache.get_stats()
+        self.assertLess(stats['entries'], 500)
+
+        # the bundle is served from the warmed values
+        with self.app.test_request_context():
+            url = self.compressor.get_bundle('big_bundle').url
+        misses = stats['misses']
+        rv = self.app.test_client().get(url, headers=[
+            ('Accept-Encoding', 'gzip')
+        ])
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(self.compressor.memory_cache.get_stats()['misses'],
+                         misses)
+
+    def test_warm_in_background(self):
+        warm_up = self.compressor.warm(background=True)
+        self.assertTrue(warm_up.wait(10))
+        self.assertEqual(warm_up.done, 1)
+        self.assertIsNotNone(warm_up.duration)
+
+    def test_errors(self):
+        self.compressor.register_bundle(CSSBundle(
+            name='broken_bundle',
+            assets=[Asset(content='foo')],
+            processors=['broken'],
+        ))
+        warm_up = self.compressor.warm(self.app)
+        self.assertTrue(warm_up.is_ready())
+        self.assertEqual(warm_up.done, 2)
+        self.assertEqual(list(warm_up.errors), ['broken_bundle'])
+
+    def test_ready_url(self):
+        client = self.app.test_client()
+        rv = client.get('/_compressor/ready')
+        self.assertEqual(rv.status_code, 200)
+
+        self.compressor.warm_up = WarmUp(self.app, [])
+        rv = client.get('/_compressor/ready')
+        self.assertEqual(rv.status_code, 503)
+        self.assertFalse(json.loads(rv.data.decode('utf8'))['ready'])
+
+        self.compressor.warm()
+        rv = client.get('/_compressor/ready')
+        self.assertEqual(rv.status_code, 200)
+        data = json.loads(rv.data.decode('utf8'))
+        self.assertTrue(data['ready'])
+        self.assertEqual(data['done'], 1)
+        self.assertIn('test_bundle', data['bundles'])
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_STATS'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        def test1(content):
+            return "FOOBAR" + str(content)
+
+        compressor.register_processor(test1)
+
+        bundle = CSSBundle(
+            name='test_bundle',
+            assets=[Asset(content='first asset', processors=['test1'])],
+            processors=['test1'],
+        )
+        compressor.register_bundle(bundle)
+        with app.test_request_context():
+            self.bundle_url = bundle.url
+
+    def test_signals(self):
+        called = []
+        served = []
+
+        def on_processor_called(sender, name, duration):
+            called.append((sender, name, duration))
+
+        def on_content_served(sender, kind, name, response):
+            served.append((sender, kind, name, response.status_code))
+
+        processor_called.connect(on_processor_called, sender=self.app)
+        self.addCleanup(processor_called.disconnect, on_processor_called)
+        content_served.connect(on_content_served, sender=self.app)
+        self.addCleanup(content_served.disconnect, on_content_served)
+
+        with self.app.test_request_context():
+            self.compressor.run_processor('test1', 'foobar')
+        self.assertEqual(len(called), 1)
+        self.assertEqual(called[0][:2], (self.app, 'test1'))
+        self.assertGreaterEqual(called[0][2], 0)
+
+        self.app.test_client().get(self.bundle_url)
+        self.assertEqual(served, [(self.app, 'bundle', 'test_bundle', 200)])
+
+    def test_stats(self):
+        client = self.app.test_client()
+        client.get(self.bundle_url)
+        client.get(self.bundle_url)
+
+        stats = json.loads(client.get('/_compressor/stats').data
+                           .decode('utf8'))
+        durations = stats['compressor_processor_duration_seconds']
+        self.assertEqual(durations['type'], 'histogram')
+        self.assertEqual(durations['samples'][0]['labels'],
+                         {'processor': 'test1'})
+        self.assertEqual(durations['samples'][0]['count'], 2)
+        self.assertEqual(durations['samples'][0]['buckets'][-1], ['+Inf', 2])
+
+        sizes = stats['compressor_response_size_bytes']['samples']
+        self.assertEqual(sizes[0]['labels'],
+                         {'kind': 'bundle', 'encoding': 'identity'})
+        self.assertEqual(sizes[0]['count'], 2)
+        self.assertEqual(sizes[0]['sum'], 2 * len('FOOBARFOOBARfirst asset'))
+
+        hits = stats['compressor_cache_hits_total']['samples']
+        self.assertEqual(hits[0]['labels'], {'cache': 'memory'})
+        self.assertGreater(hits[0]['value'], 0)
+
+    def test_prometheus_format(self):
+        client = self.app.test_client()
+        client.get(self.bundle_url)
+        rv = client.get('/_compressor/stats?format=prometheus')
+        text = rv.data.decode('utf8')
+        self.assertTrue(rv.content_type.startswith('text/plain'))
+        self.assertIn('# TYPE compressor_processor_duration_seconds '
+                      'histogram', text)
+        self.assertIn('compressor_processor_duration_seconds_bucket'
+                      '{le="+Inf",processor="test1"} 2', text)
+        self.assertIn('compressor_responses_total'
+                      '{kind="bundle",status="200"} 1', text)
+
+    def test_stats_disabled(self):
+        app = flask.Flask(__name__)
+        Compressor(app)
+        rv = app.test_client().get('/_compressor/stats')
+        self.assertEqual(rv.status_code, 404)
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.fail = False
+
+        def slow(content):
+            self.calls.append(content)
+            self.started.set()
+            self.release.wait(10)
+            if self.fail:
+                raise CompressorProcessorException('slow failed')
+            return content.upper()
+
+        compressor.register_processor(slow)
+        compressor.register_bundle(CSSBundle(
+            name='test_bundle',
+            assets=[Asset(content='first asset')],
+            processors=['slow'],
+        ))
+
+    def get_content_in_threads(self, count):
+        results = []
+
+        def run():
+            with self.app.app_context():
+                bundle = self.compressor.get_bundle('test_bundle')
+                try:
+                    results.append(bundle.get_content())
+                except CompressorProcessorException as e:
+                    results.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        threads[0].start()
+        self.started.wait(10)
+        for thread in threads[1:]:
+            thread.start()
+        # wait for the other threads to wait for the first one
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join(10)
+        return results
+
+    def test_concurrent_calls(self):
+        results = self.get_content_in_threads(5)
+        self.assertEqual(results, ['FIRST ASSET'] * 5)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(self.compressor.single_flight), 0)
+
+    def test_errors_not_cached(self):
+        self.fail = True
+        results = self.get_content_in_threads(3)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(isinstance(result, CompressorProcessorException)
+                            for result in results))
+        self.assertEqual(len(self.calls), 1)
+
+        self.fail = False
+        with self.app.app_context():
+            bundle = self.compressor.get_bundle('test_bundle')
+            self.assertEqual(bundle.get_content(), 'FIRST ASSET')
+        self.assertEqual(len(self.calls), 2)
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_MEMORY_CACHE_MAX_ENTRIES'] = 100
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+    def test_max_entries(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('foo', 'foo')
+        cache.set('bar', 'bar')
+        self.assertEqual(cache.get('foo'), 'foo')
+        cache.set('baz', 'baz')
+        self.assertIsNone(cache.get('bar'))
+        self.assertEqual(cache.get('foo'), 'foo')
+        self.assertEqual(cache.get('baz'), 'baz')
+        self.assertEqual(cache.get_stats(), {
+            'hits': 3,
+            'misses': 1,
+            'evictions': 1,
+            'entries': 2,
+            'size': cache.size,
+        })
+
+    def test_max_size(self):
+        cache = LRUCache(max_entries=None, max_size=200)
+        cache.set('foo', 'a' * 100)
+        cache.set('bar', 'b' * 100)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNone(cache.get('foo'))
+        self.assertLessEqual(cache.size, 200)
+
+        cache.delete('bar')
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size, 0)
+
+    def test_owner(self):
+        class Owner(object):
+            pass
+
+        cache = LRUCache()
+        owner = Owner()
+        cache.set('foo', 'foo', owner=owner)
+        cache.set('bar', 'bar', owner=owner)
+        cache.set('baz', 'baz')
+        self.assertEqual(len(cache), 3)
+
+        del owner
+        gc.collect()
+        self.assertIsNone(cache.get('foo'))
+        self.assertEqual(len(cache), 1)
+
+    def test_memoized_bundle_is_released(self):
+        with self.app.test_request_context():
+            bundle = Bundle('test_bundle', assets=[Asset('first asset')])
+            self.compressor.register_bundle(bundle)
+            bundle.get_content()
+            self.assertIsNotNone(bundle.hash)
+            self.assertGreater(len(self.compressor.memory_cache), 0)
+
+            # replace the bundle, the old one must not be kept in memory
+            self.compressor.register_bundle(Bundle('test_bundle'),
+                                            replace=True)
+            bundle_ref = weakref.ref(bundle)
+            del bundle
+            gc.collect()
+            self.assertIsNone(bundle_ref())
+
+            # only `get_content()` of the new bundle
+            self.compressor.get_bundle('test_bundle').get_content()
+            self.assertEqual(len(self.compressor.memory_cache), 1)
+
+    def test_memoized_stats(self):
+        with self.app.test_request_context():
+            bundle = Bundle('test_bundle', assets=[Asset('first asset')])
+            bundle.get_content()
+            stats = self.compressor.memory_cache.get_stats()
+            bundle.get_content()
+            self.assertEqual(self.compressor.memory_cache.hits,
+                             stats['hits'] + 1)
+            self.assertEqual(self.compressor.memory_cache.misses,
+                             stats['misses'])
+
+    def test_unbounded_by_default(self):
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        calls = []
+
+        def count(content):
+            calls.append(content)
+            return content
+
+        compressor.register_processor(count)
+        for index in range(4):
+            compressor.register_bundle(Bundle(
+                'bundle_{}'.format(index),
+                assets=[Asset('asset {} {}'.format(index, asset_index),
+                              processors=['count'])
+                        for asset_index in range(300)],
+            ))
+        compressor.warm()
+        self.assertEqual(len(calls), 1200)
+        self.assertGreater(len(compressor.memory_cache), 1024)
+
+        # values of all assets are still cached, processors are not called
+        # again
+        with app.test_request_context():
+            for index in range(4):
+                bundle = compressor.get_bundle('bundle_{}'.format(index))
+                bundle.get_content()
+                bundle.get_contents()
+        self.assertEqual(len(calls), 1200)
+        self.assertEqual(compressor.memory_cache.evictions, 0)
+
+
+class DebugChangeDetectionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.static_folder = tempfile.mkdtemp()
+
+        # initialize the flask app
+        app = flask.Flask(__name__, static_folder=self.static_folder)
+        app.config['TESTING'] = True
+        app.debug = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        # count how many times the processor is called
+        self.calls = []
+
+        def test1(content):
+            self.calls.append(content)
+            return "FOOBAR" + str(content)
+
+        compressor.register_processor(test1)
+
+        self.write_file('first.txt', 'first asset')
+        self.write_file('second.txt', 'second asset')
+        self.bundle = Bundle(
+            name='test_bundle',
+            assets=[
+                FileAsset('first.txt', processors=['test1']),
+                FileAsset('second.txt', processors=['test1']),
+            ],
+        )
+        compressor.register_bundle(self.bundle)
+
+    def tearDown(self):
+        shutil.rmtree(self.static_folder)
+
+    def write_file(self, filename, content, mtime=None):
+        path = os.path.join(self.static_folder, filename)
+        with open(path, 'w') as handle:
+            handle.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_cached_until_modified(self):
+        with self.app.test_request_context():
+            self.assertEqual(self.bundle.get_content(),
+                             'FOOBARfirst asset\nFOOBARsecond asset')
+            self.assertEqual(len(self.calls), 2)
+
+            # nothing has changed
+            self.bundle.get_content()
+            self.assertIsNotNone(self.bundle.hash)
+            self.assertEqual(len(self.calls), 2)
+
+            # only the modified asset is processed again
+            self.write_file('second.txt', 'modified asset', mtime=1000)
+            self.assertEqual(self.bundle.get_content(),
+                             'FOOBARfirst asset\nFOOBARmodified asset')
+            self.assertEqual(self.calls[2:], ['modified asset'])
+
+    def test_signature(self):
+        with self.app.test_request_context():
+            signature = self.bundle.get_source_signature()
+            self.assertEqual(signature, self.bundle.get_source_signature())
+            self.write_file('first.txt', 'first asset', mtime=1000)
+            self.assertNotEqual(signature,
+                                self.bundle.get_source_signature())
+            self.assertIsNone(Asset('foobar').get_source_signature())
+
+
+class ProcessorCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        self.calls = []
+
+        def test1(content):
+            self.calls.append(content)
+            return content.upper()
+
+        self.test1 = test1
+        compressor.register_processor(test1)
+
+    def create_bundle(self, name, *contents):
+        return Bundle(name, assets=[Asset(content, processors=['test1'])
+                                    for content in contents],
+                      processors=['test1'])
+
+    def test_shared_between_bundles(self):
+        with self.app.test_request_context():
+            self.create_bundle('first', 'reset', 'first').get_content()
+            self.assertEqual(len(self.calls), 3)
+
+            # `reset` is processed only once
+            self.assertEqual(
+                self.create_bundle('second', 'reset', 'second').get_content(),
+                'RESET\nSECOND'
+            )
+            self.assertEqual(self.calls,
+                             ['reset', 'first', 'RESET\nFIRST', 'second',
+                              'RESET\nSECOND'])
+
+    def test_version(self):
+        with self.app.test_request_context():
+            self.compressor.run_processor('test1', 'foo')
+            self.compressor.run_processor('test1', 'foo')
+            self.assertEqual(len(self.calls), 1)
+
+            self.test1.version = '2'
+            self.compressor.run_processor('test1', 'foo')
+            self.assertEqual(len(self.calls), 2)
+
+    def test_replaced_processor(self):
+        with self.app.test_request_context():
+            self.assertEqual(self.compressor.run_processor('test1', 'foo'),
+                             'FOO')
+
+            self.compressor.register_processor(lambda s: s + '!',
+                                               name='test1', replace=True)
+            self.assertEqual(len(self.compressor.processor_cache), 0)
+            self.assertEqual(self.compressor.run_processor('test1', 'foo'),
+                             'foo!')
+            self.assertEqual(
+                self.create_bundle('bundle', 'foo').get_content(), 'foo!!'
+            )
+
+    def test_not_cacheable(self):
+        self.test1.cacheable = False
+        with self.app.test_request_context():
+            self.compressor.run_processor('test1', 'foo')
+            self.compressor.run_processor('test1', 'foo')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_disabled(self):
+        app = flask.Flask(__name__)
+        app.config['COMPRESSOR_PROCESSOR_CACHE_MAX_ENTRIES'] = 0
+        compressor = Compressor(app)
+        compressor.register_processor(self.test1)
+        self.assertIsNone(compressor.processor_cache)
+        with app.test_request_context():
+            compressor.run_processor('test1', 'foo')
+            compressor.run_processor('test1', 'foo')
+        self.assertEqual(len(self.calls), 2)
+
+
+class IncrementalBundleTestCase(unittest.TestCase):
+    def setUp(self):
+        self.static_folder = tempfile.mkdtemp()
+
+        # initialize the flask app
+        app = flask.Flask(__name__, static_folder=self.static_folder)
+        app.config['TESTING'] = True
+        app.debug = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        # count how many times each processor is called
+        self.calls = []
+
+        def upper(content):
+            self.calls.append(('upper', content))
+            return content.upper()
+
+        def wrap(content):
+            self.calls.append(('wrap', content))
+            return '[' + content + ']'
+        wrap.whole_bundle = True
+
+        compressor.register_processor(upper)
+        compressor.register_processor(wrap)
+
+        for i in range(3):
+            self.write_file('{}.txt'.format(i), 'asset {}'.format(i))
+
+    def tearDown(self):
+        shutil.rmtree(self.static_folder)
+
+    def write_file(self, filename, content, mtime=None):
+        path = os.path.join(self.static_folder, filename)
+        with open(path, 'w') as handle:
+            handle.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def create_bundle(self, processors, incremental=True):
+        return Bundle(
+            name='test_bundle',
+            assets=[FileAsset('{}.txt'.format(i)) for i in range(3)],
+            processors=processors,
+            incremental=incremental,
+        )
+
+    def test_split_processors(self):
+        with self.app.test_request_context():
+            bundle = self.create_bundle(['upper', 'wrap', 'upper'])
+            self.assertEqual(bundle.split_processors(),
+                             (['upper'], ['wrap', 'upper']))
+            bundle = self.create_bundle(['upper', 'upper'])
+            self.assertEqual(bundle.split_processors(),
+                             (['upper', 'upper'], []))
+            bundle = self.create_bundle(['upper'], incremental=False)
+            self.assertEqual(bundle.split_processors(), ([], ['upper']))
+
+    def test_only_modified_assets(self):
+        with self.app.test_request_context():
+            bundle = self.create_bundle(['upper', 'wrap'])
+            self.assertEqual(bundle.get_content(),
+                             '[ASSET 0\nASSET 1\nASSET 2]')
+            self.assertEqual(len(self.calls), 4)
+
+            self.write_file('1.txt', 'modified', mtime=1000)
+            self.assertEqual(bundle.get_content(),
+                             '[ASSET 0\nMODIFIED\nASSET 2]')
+            self.assertEqual(self.calls[4:], [
+                ('upper', 'modified'),
+                ('wrap', 'ASSET 0\nMODIFIED\nASSET 2'),
+            ])
+
+    def test_not_incremental(self):
+        with self.app.test_request_context():
+            bundle = self.create_bundle(['upper'], incremental=False)
+            self.assertEqual(bundle.get_content(),
+                             'ASSET 0\nASSET 1\nASSET 2')
+            self.assertEqual(self.calls,
+                             [('upper', 'asset 0\nasset 1\nasset 2')])
+
+
+class FingerprintTestCase(unittest.TestCase):
+    def create_app(self, algorithm='md5', length=None):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_HASH_ALGORITHM'] = algorithm
+        app.config['COMPRESSOR_HASH_LENGTH'] = length
+        Compressor(app)
+        return app
+
+    def create_bundle(self, incremental=False):
+        return Bundle(
+            name='test_bundle',
+            assets=[Asset('first asset \u00e9'), Asset('second asset')],
+            incremental=incremental,
+        )
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint(['foo', 'bar']),
+                         hashlib.md5(b'foobar').hexdigest())
+        self.assertEqual(fingerprint(['foo', 'bar'], 'sha1', 8),
+                         hashlib.sha1(b'foobar').hexdigest()[:8])
+        self.assertRaises(CompressorException, fingerprint, ['foo'],
+                          'unknown')
+
+    def test_default_algorithm(self):
+        with self.create_app().test_request_context():
+            bundle = self.create_bundle()
+            self.assertEqual(
+                bundle.hash,
+                hashlib.md5(bundle.get_content().encode('utf-8')).hexdigest()
+            )
+            self.assertEqual(
+                bundle.assets[0].hash,
+                hashlib.md5('first asset \u00e9'.encode('utf-8'))
+                .hexdigest()
+            )
+
+    def test_incremental_hash(self):
+        with self.create_app('blake2b', 12).test_request_context():
+            bundle = self.create_bundle(incremental=True)
+            self.assertEqual(len(bundle.hash), 12)
+            self.assertEqual(bundle.hash,
+                             fingerprint([bundle.get_content()], 'blake2b',
+                                         12))
+            self.assertEqual(bundle.hash, self.create_bundle().hash)
+            self.assertIn(bundle.hash, bundle.url)
+
+    @unittest.skipIf(xxhash is None, 'xxhash is not installed')
+    def test_xxhash(self):
+        with self.create_app('xxhash').test_request_context():
+            self.assertIsNotNone(self.create_bundle().hash)
+
+    def test_unknown_algorithm(self):
+        self.assertRaises(CompressorException, self.create_app, 'unknown')
+
+
+class ExecutorTestCase(unittest.TestCase):
+    def create_app(self, executor):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_EXECUTOR'] = executor
+        app.config['COMPRESSOR_MAX_WORKERS'] = 4
+        compressor = Compressor(app)
+        self.addCleanup(compressor.executor.shutdown)
+        compressor.register_processor(upper_processor)
+        return app, compressor
+
+    def test_thread_executor(self):
+        app, compressor = self.create_app('thread')
+        threads = set()
+
+        def slow(content):
+            threads.add(threading.current_thread().name)
+            time.sleep(0.05)
+            return content + '!'
+
+        compressor.register_processor(slow)
+        bundle = Bundle(
+            'test_bundle',
+            assets=[Asset('asset {}'.format(i), processors=['slow'])
+                    for i in range(4)],
+            processors=['slow'],
+        )
+
+        with app.test_request_context():
+            self.assertEqual(bundle.get_contents(),
+                             ['asset {}!!'.format(i) for i in range(4)])
+        self.assertGreater(len(threads), 1)
+
+    def test_process_executor(self):
+        app, compressor = self.create_app('process')
+        bundle = Bundle(
+            'test_bundle',
+            assets=[Asset('first asset'), Asset('second asset')],
+            processors=['upper_processor'],
+        )
+
+        with app.test_request_context():
+            contents = bundle.get_contents()
+        self.assertEqual([content.split(':')[1] for content in contents],
+                         ['FIRST ASSET', 'SECOND ASSET'])
+        self.assertNotEqual(contents[0].split(':')[0], str(os.getpid()))
+
+        # the debug flag is given to the processors
+        app.debug = True
+        with app.test_request_context():
+            self.assertEqual(bundle.get_contents(),
+                             ['first asset', 'second asset'])
+
+    def test_unknown_executor(self):
+        app = flask.Flask(__name__)
+        app.config['COMPRESSOR_EXECUTOR'] = 'foobar'
+        self.assertRaises(CompressorException, Compressor, app)
+
+
+# a stub LESS compiler implementing the protocol of `lessc_worker.js`
+LESSC_STUB = '''
+import os
+import sys
+import json
+import time
+
+for line in iter(sys.stdin.readline, ''):
+    request = json.loads(line)
+    if request.get('ping'):
+        response = {'pong': True}
+    elif request['source'] == 'crash':
+        sys.exit(1)
+    elif request['source'] == 'hang':
+        # a wedged worker, still alive
+        time.sleep(60)
+    elif request['source'] == 'error':
+        response = {'error': 'syntax error'}
+    else:
+        response = {'css': '{}:{}'.format(os.getpid(), request['source'])}
+    sys.stdout.write(json.dumps(response) + '\\n')
+    sys.stdout.flush()
+'''
+
+
+class LesscWorkerPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.stub = tempfile.mkstemp(suffix='.py')
+        os.write(fd, LESSC_STUB.encode('utf-8'))
+        os.close(fd)
+
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['COMPRESSOR_LESSC_POOL_SIZE'] = 2
+        app.config['COMPRESSOR_LESSC_WORKER_COMMAND'] = [sys.executable,
+                                                         self.stub]
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+        self.pool = compressor.lessc_pool
+
+    def tearDown(self):
+        self.pool.close()
+        os.remove(self.stub)
+
+    def compile(self, content):
+        with self.app.test_request_context():
+            processor = self.compressor.get_processor('lesscss')
+            pid, css = processor(content).split(':')
+            return int(pid), css
+
+    def test_workers_are_reused(self):
+        self.assertIsInstance(self.pool, LesscWorkerPool)
+        pids = set()
+        for i in range(6):
+            pid, css = self.compile('content {}'.format(i))
+            self.assertEqual(css, 'content {}'.format(i))
+            pids.add(pid)
+        self.assertLessEqual(len(pids), 2)
+
+    def test_error(self):
+        with self.app.test_request_context():
+            processor = self.compressor.get_processor('lesscss')
+            with self.assertRaises(CompressorProcessorException) as cm:
+                processor('error')
+        self.assertIn('syntax error', str(cm.exception))
+
+        # the worker is still usable
+        self.assertEqual(self.compile('foobar')[1], 'foobar')
+
+    def test_restart(self):
+        self.assertRaises(CompressorProcessorException, self.pool.compile,
+                          'crash')
+        self.assertEqual(self.compile('foobar')[1], 'foobar')
+
+    def test_check_health(self):
+        # workers are started by the first health check
+        self.assertEqual(self.pool.check_health(), 2)
+        self.assertEqual(self.pool.check_health(), 0)
+
+        worker = self.pool._workers.get()
+        worker.process.kill()
+        worker.process.wait()
+        self.pool._workers.put(worker)
+        self.assertEqual(self.pool.check_health(), 1)
+
+    def test_timeout(self):
+        self.pool.timeout = 0.5
+        pid = self.compile('foobar')[0]
+
+        start = time.time()
+        self.assertRaises(CompressorProcessorException, self.pool.compile,
+                          'hang')
+        # the content is not sent again to another worker
+        self.assertLess(time.time() - start, 5)
+
+        # the wedged worker is replaced
+        pids = set(self.compile('foobar')[0] for _ in range(2))
+        self.assertEqual(len(pids), 2)
+        self.assertIn(pid, pids)
+
+    def test_write_timeout(self):
+        pool = LesscWorkerPool(command=self.pool.command, size=1,
+                               timeout=0.5)
+        self.addCleanup(pool.close)
+        pid = int(pool.compile('foobar').split(':')[0])
+
+        # a wedged worker doesn't read its input, the pipe gets full
+        worker = pool._workers.get()
+        worker.process.stdin.write(b'{"source": "hang"}\n')
+        worker.process.stdin.flush()
+        pool._workers.put(worker)
+
+        start = time.time()
+        self.assertRaises(CompressorProcessorException, pool.compile,
+                          'x' * (4 * 1024 * 1024))
+        self.assertLess(time.time() - start, 5)
+
+        # the wedged worker is replaced
+        self.assertNotEqual(int(pool.compile('foobar').split(':')[0]), pid)
+
+    def test_check_health_of_wedged_worker(self):
+        self.assertEqual(self.pool.check_health(), 2)
+
+        worker = self.pool._workers.get()
+        pid = worker.process.pid
+        worker.process.stdin.write(b'{"source": "hang"}\n')
+        worker.process.stdin.flush()
+        self.pool._workers.put(worker)
+
+        start = time.time()
+        self.assertEqual(self.pool.check_health(timeout=0.5), 1)
+        self.assertLess(time.time() - start, 5)
+        self.assertNotEqual(worker.process.pid, pid)
+        self.assertTrue(worker.ping())
+
+    def test_health_check_thread(self):
+        pool = LesscWorkerPool(command=self.pool.command, size=1,
+                               health_check_interval=0.1)
+        self.addCleanup(pool.close)
+
+        # the worker is started by the first health check
+        worker = pool._workers.get()
+        pool._workers.put(worker)
+        for _ in range(50):
+            if worker.is_alive():
+                break
+            time.sleep(0.1)
+        self.assertTrue(worker.is_alive())
+
+
+# the asynchronous pipeline requires Python 3.7 or later
+if sys.version_info >= (3, 7):
+    from tests_aio import AsyncTestCase
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Flask-Compressor test suite for the asynchronous pipeline
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Requires Python 3.7 or later, loaded by `tests.py` when available.
+
+"""
+
+import os
+import sys
+import time
+import shutil
+import asyncio
+import tempfile
+import unittest
+import flask
+from flask_compressor import Compressor, Bundle, Asset
+
+
+# a stub `lessc` command, upper-casing its input
+LESSC_COMMAND_STUB = '''#!{python}
+import sys
+sys.stdout.write(sys.stdin.read().upper())
+'''
+
+
+class AsyncTestCase(unittest.TestCase):
+    def setUp(self):
+        # initialize the flask app
+        app = flask.Flask(__name__)
+        app.config['TESTING'] = True
+        compressor = Compressor(app)
+        self.app = app
+        self.compressor = compressor
+
+        self.calls = []
+
+        async def slow_upper(content):
+            self.calls.append(content)
+            await asyncio.sleep(0.2)
+            return content.upper()
+
+        def exclaim(content):
+            self.calls.append(content)
+            return content + '!'
+
+        compressor.register_processor(slow_upper)
+        compressor.register_processor(exclaim)
+
+        bundle = Bundle(
+            'test_bundle',
+            assets=[Asset('first asset', processors=['slow_upper']),
+                    Asset('second asset', processors=['slow_upper']),
+                    Asset('third asset', processors=['exclaim'])],
+            processors=['exclaim'],
+        )
+        self.bundle = bundle
+        compressor.register_bundle(bundle)
+
+    def test_aget_content(self):
+        with self.app.test_request_context():
+            start = time.time()
+            content = asyncio.run(self.bundle.aget_content())
+            duration = time.time() - start
+        self.assertEqual(content, 'FIRST ASSET\nSECOND ASSET\nthird asset!!')
+
+        # assets are processed concurrently
+        self.assertLess(duration, 0.35)
+
+    def test_shared_with_sync_calls(self):
+        with self.app.test_request_context():
+            content = asyncio.run(self.bundle.aget_content())
+            calls = len(self.calls)
+            self.assertEqual(self.bundle.get_content(), content)
+            self.assertEqual(self.bundle.assets[0].content, 'FIRST ASSET')
+            self.assertEqual(len(self.calls), calls)
+
+            self.assertEqual(
+                asyncio.run(self.bundle.assets[2].aget_content()),
+                'third asset!'
+            )
+            self.assertEqual(len(self.calls), calls)
+
+    def test_coroutine_processor_in_sync_call(self):
+        with self.app.test_request_context():
+            self.assertEqual(self.bundle.get_content(),
+                             'FIRST ASSET\nSECOND ASSET\nthird asset!!')
+
+    def test_coroutine_processor_in_running_loop(self):
+        async def view():
+            return self.bundle.assets[0].content
+
+        with self.app.test_request_context():
+            self.assertEqual(asyncio.run(view()), 'FIRST ASSET')
+
+    def test_lesscss_subprocess(self):
+        bin_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, bin_dir)
+        path = os.path.join(bin_dir, 'lessc')
+        with open(path, 'w') as handle:
+            handle.write(LESSC_COMMAND_STUB.format(python=sys.executable))
+        os.chmod(path, 0o755)
+
+        environ_path = os.environ['PATH']
+        self.addCleanup(os.environ.__setitem__, 'PATH', environ_path)
+        os.environ['PATH'] = bin_dir + os.pathsep + environ_path
+
+        bundle = Bundle('less_bundle', assets=[Asset('a { b: c }')],
+                        processors=['lesscss'])
+        with self.app.test_request_context():
+            self.assertEqual(asyncio.run(bundle.aget_content()), 'A { B: C }')
+
+    def test_processor_cache(self):
+        with self.app.test_request_context():
+            content = self.bundle.assets[2].content
+            calls = len(self.calls)
+
+            # `third asset` is already processed by `exclaim`
+            bundle = Bundle('other_bundle',
+                            assets=[Asset('third asset',
+                                          processors=['exclaim'])])
+            self.assertEqual(asyncio.run(bundle.aget_content()),
+                             'third asset!')
+            self.assertEqual(asyncio.run(bundle.aget_content()), content)
+        self.assertEqual(len(self.calls), calls)
+
+
+if __name__ == '__main__':
+    unittest.main()